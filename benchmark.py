@@ -0,0 +1,298 @@
+"""Synthetic diary generator and timings for the hot paths of the memory map.
+
+    python benchmark.py generate --size 100000 --db memory_map.db
+    python benchmark.py run --sizes 1000 10000 100000 --json bench.json
+    python benchmark.py run --sizes 1000 10000 --compare bench.json
+    python benchmark.py plans --db memory_map.db
+
+Datasets for `run` are generated once per size into --data-dir and reused.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from datetime import timedelta
+
+from memory_store import MemoryStore
+from timenode import TimeNode, ValidityWindow, timeframe_label
+
+BIRTHDATE = "1966-03-14"
+YEARS = 60
+
+# Depth of the key a memory is filed under and how often, weighted towards hours and days
+ORIGIN_DEPTHS = {8: 50, 7: 2, 6: 20, 5: 4, 4: 12, 3: 2, 2: 8, 1: 2}
+WORDS = (
+    "morning evening walk school work trip sea city friend family dinner rain snow "
+    "train book film music call letter garden house street summer winter party"
+).split()
+
+
+def random_moment(rng, birthdate, now):
+    # Later years hold more entries, roughly like a diary that gets denser with age
+    span = (now - birthdate).total_seconds()
+    return birthdate + timedelta(seconds=span * rng.random() ** 0.6)
+
+
+def random_text(rng, idx):
+    body = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 60)))
+    if rng.random() < 0.6:
+        return f"[{rng.choice(WORDS).title()} {idx}]{body}"
+    return f"{body} #{idx}"
+
+
+def generate(path, size, seed=0):
+    """Fill the database at path with size records spread over YEARS years."""
+    rng = random.Random(seed)
+    store = MemoryStore(path)
+    birthdate = store.get_birthdate() or store.set_birthdate(BIRTHDATE)
+    birth_year = birthdate.year
+    now = birthdate + timedelta(days=365 * YEARS)
+
+    rows = []
+    for idx in range(size):
+        moment = random_moment(rng, birthdate, now)
+        depth = rng.choices(list(ORIGIN_DEPTHS), weights=list(ORIGIN_DEPTHS.values()))[0]
+        origin = TimeNode.key_for(moment, birth_year, depth)
+        rows.append(
+            (
+                origin,
+                random_text(rng, idx),
+                rng.random() < 0.05,
+                rng.random() < 0.03,
+            )
+        )
+    with store.bulk_insert() as cursor:
+        cursor.executemany(
+            "INSERT OR IGNORE INTO record (origin, text, show_above, show_below) VALUES (?, ?, ?, ?)",
+            rows,
+        )
+
+    # Select ~2% of the records for one of their ancestors, or their own node
+    store.cursor.execute("SELECT id, origin FROM record")
+    selections = [
+        (record_id, origin[: rng.randint(1, len(origin))])
+        for record_id, origin in store.cursor.fetchall()
+        if rng.random() < 0.02
+    ]
+    store.cursor.executemany(
+        "INSERT OR IGNORE INTO record_selection (record_id, node_key) VALUES (?, ?)",
+        selections,
+    )
+    store.conn.commit()
+    store.close()
+
+
+def timed(func, args_list):
+    """Run func over args_list and return per-call timings in milliseconds."""
+    timings = []
+    for args in args_list:
+        started = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(timings):
+    return {
+        "calls": len(timings),
+        "median_ms": statistics.median(timings),
+        "mean_ms": statistics.fmean(timings),
+        "max_ms": max(timings),
+    }
+
+
+def sample_nodes(store, rng, repeat):
+    store.cursor.execute("SELECT origin FROM record ORDER BY random() LIMIT ?", (repeat,))
+    origins = [row[0] for row in store.cursor.fetchall()]
+    store.cursor.execute("SELECT node_key FROM record_selection ORDER BY random() LIMIT ?", (repeat,))
+    selected = [row[0] for row in store.cursor.fetchall()] or origins
+    return origins, selected
+
+
+def bench_store(path, repeat, seed):
+    rng = random.Random(seed)
+    store = MemoryStore(path)
+    birthdate = store.get_birthdate()
+    birth_year = birthdate.year
+    origins, selected = sample_nodes(store, rng, repeat)
+
+    def parent_of(origin, level):
+        return origin[: min(level, len(origin))]
+
+    results = {
+        "get_records[Self]": timed(
+            lambda key: store.get_records(origin=key), [(o,) for o in origins]
+        ),
+        "get_records[Selected]": timed(
+            lambda key: store.get_records(selected_list=key), [(k,) for k in selected]
+        ),
+        "get_records[High TF]": timed(
+            lambda key: store.get_records(show_below_parent=key),
+            [(parent_of(o, 4),) for o in origins],
+        ),
+        "get_records[Low TF]": timed(
+            lambda key: store.get_records(show_above_child=key),
+            [(parent_of(o, 2),) for o in origins],
+        ),
+        "fetch_selected_for_record": timed(
+            store.fetch_selected_for_record, [(k,) for k in selected]
+        ),
+        "fetch_selected_titles": timed(
+            store.fetch_selected_titles, [(parent_of(o, rng.randint(0, 3)),) for o in origins]
+        ),
+    }
+
+    TimeNode.interval.cache_clear()
+    results["get_timeframe_label"] = timed(
+        timeframe_label, [(o, birth_year) for o in origins]
+    )
+    validity = ValidityWindow(birthdate, birth_year)
+    results["is_valid_child"] = timed(validity.is_valid, [(o,) for o in origins])
+
+    store.close()
+    return {name: summarize(timings) for name, timings in results.items()}
+
+
+def bench_refresh_view(path, repeat, seed):
+    """Time MemoryApp.refresh_view on the offscreen Qt platform; None without PyQt5."""
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    try:
+        from PyQt5.QtWidgets import QApplication
+    except ImportError:
+        return None
+    import memories
+
+    rng = random.Random(seed)
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    store = MemoryStore(path)
+    origins, _ = sample_nodes(store, rng, repeat)
+
+    window = memories.MemoryApp(store)
+
+    def show(origin):
+        level = rng.randint(0, min(len(origin), 7) - 1)
+        window.current_parent = TimeNode(origin[:level])
+        window.selected_child = origin[: level + 1]
+        window.refresh_view()
+        app.processEvents()
+
+    timings = timed(show, [(o,) for o in origins])
+    window.close()
+
+    store.close()
+    return summarize(timings)
+
+
+def check_query_plans(path):
+    """Fail when a record list query scans the record table instead of searching an index."""
+    store = MemoryStore(path)
+    store.cursor.execute("SELECT origin FROM record LIMIT 1")
+    row = store.cursor.fetchone()
+    origin = row[0] if row else "CDAB"
+
+    plans = {
+        "Self": store.explain_records_query(origin=origin),
+        "Selected": store.explain_records_query(selected_list=origin[:2]),
+        "High TF": store.explain_records_query(show_below_parent=origin[:4]),
+        "Low TF": store.explain_records_query(show_above_child=origin[:2]),
+    }
+    store.close()
+
+    for name, details in plans.items():
+        print(f"  {name:<9} " + " | ".join(details))
+        scans = [detail for detail in details if detail.startswith("SCAN record")]
+        if scans:
+            raise SystemExit(f"{name} query scans the record table: {scans}")
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            capture_output=True,
+            text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        ).stdout.strip()
+    except OSError:
+        return ""
+
+
+def print_report(report, baseline=None):
+    for size, results in report["sizes"].items():
+        print(f"\n{size} records")
+        for name, stats in results.items():
+            line = f"  {name:<28} {stats['median_ms']:>9.3f} ms median {stats['mean_ms']:>9.3f} ms mean"
+            previous = (baseline or {}).get("sizes", {}).get(size, {}).get(name)
+            if previous and previous["median_ms"]:
+                line += f"  x{stats['median_ms'] / previous['median_ms']:.2f} vs {baseline.get('revision') or 'baseline'}"
+            print(line)
+
+
+def run(args):
+    os.makedirs(args.data_dir, exist_ok=True)
+    report = {"revision": git_revision(), "repeat": args.repeat, "sizes": {}}
+
+    for size in args.sizes:
+        path = os.path.join(args.data_dir, f"bench_{size}_{args.seed}.db")
+        if not os.path.exists(path):
+            print(f"Generating {size} records into {path}", file=sys.stderr)
+            generate(path, size, args.seed)
+
+        print(f"Query plans for {size} records", file=sys.stderr)
+        check_query_plans(path)
+        results = bench_store(path, args.repeat, args.seed)
+        if not args.no_gui:
+            refresh = bench_refresh_view(path, args.repeat, args.seed)
+            if refresh is None:
+                print("PyQt5 not available, skipping refresh_view", file=sys.stderr)
+            else:
+                results["refresh_view"] = refresh
+        report["sizes"][str(size)] = results
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    generate_cmd = commands.add_parser("generate", help="fill a database with synthetic memories")
+    generate_cmd.add_argument("--size", type=int, default=10000)
+    generate_cmd.add_argument("--db", default="memory_map.db")
+    generate_cmd.add_argument("--seed", type=int, default=0)
+
+    run_cmd = commands.add_parser("run", help="time the hot paths per dataset size")
+    run_cmd.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    run_cmd.add_argument("--repeat", type=int, default=50, help="calls per measured path")
+    run_cmd.add_argument("--seed", type=int, default=0)
+    run_cmd.add_argument("--data-dir", default="bench_data")
+    run_cmd.add_argument("--json", help="write the results to this file")
+    run_cmd.add_argument("--compare", help="results file of an earlier run to compare against")
+    run_cmd.add_argument("--no-gui", action="store_true", help="skip the offscreen refresh_view timing")
+
+    plans_cmd = commands.add_parser("plans", help="check that the record list queries use indexes")
+    plans_cmd.add_argument("--db", default="memory_map.db")
+
+    args = parser.parse_args(argv)
+    if args.command == "generate":
+        generate(args.db, args.size, args.seed)
+    elif args.command == "plans":
+        check_query_plans(args.db)
+    else:
+        run(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,201 @@
+"""Headless access to the memory map, for scripts and cron jobs.
+
+    python cli.py add --key CDBA "[Lighthouse]Walked there at dusk"
+    python cli.py add --at "2014-06-01 18:30" "Walked to the lighthouse"
+    some_script | python cli.py add             # one record per line, filed under now
+    python cli.py list CDBA --list "Low TF"
+    python cli.py select 42 CD
+    python cli.py stats CD
+    python cli.py export --key CD --format md
+    python cli.py import journal.md entries.jsonl
+
+Never imports Qt. The importer and exporter are only loaded by the commands
+that need them. Reading commands open the database read-only; the only
+write they ever make is upgrading a database no newer writer has opened.
+"""
+import argparse
+import sqlite3
+import sys
+from datetime import datetime
+
+from memory_store import RECORD_LISTS, MemoryStore
+from timenode import TimeNode, timeframe_label
+
+DB_PATH = "memory_map.db"
+
+
+def open_store(path, readonly=False):
+    try:
+        if readonly:
+            return MemoryStore.open_reader(path)
+        return MemoryStore(path, write_behind=True)
+    except sqlite3.OperationalError as e:
+        raise SystemExit(f"Cannot open {path}: {e}")
+
+
+def birth_year_of(store):
+    birthdate = store.get_birthdate()
+    if not birthdate:
+        raise SystemExit("No birthdate set, run with --birthdate YYYY-MM-DD once")
+    return birthdate.year
+
+
+def checked_key(key, birth_year):
+    try:
+        TimeNode.interval(key, birth_year)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    return key
+
+
+def origin_for(args, birth_year):
+    """Key given by --key, or the node of the --at moment, or of the current hour."""
+    if args.key:
+        return checked_key(args.key, birth_year)
+    if args.at:
+        from importer import DAY_DEPTH, HOUR_DEPTH, parse_timestamp
+
+        parsed = parse_timestamp(args.at)
+        if not parsed:
+            raise SystemExit(f"Cannot read timestamp {args.at!r}")
+        moment, has_time = parsed
+        origin = TimeNode.key_for(moment, birth_year, HOUR_DEPTH if has_time else DAY_DEPTH)
+    else:
+        origin = TimeNode.key_for(datetime.now(), birth_year)
+    if not origin:
+        raise SystemExit("Moment lies before the birth year")
+    return origin
+
+
+def cmd_add(args):
+    store = open_store(args.db)
+    try:
+        if args.birthdate and not store.get_birthdate():
+            try:
+                store.set_birthdate(args.birthdate)
+            except ValueError as e:
+                raise SystemExit(f"Invalid --birthdate {args.birthdate!r}: {e}")
+        origin = origin_for(args, birth_year_of(store))
+        texts = args.texts or (line.rstrip("\n") for line in sys.stdin)
+        added = skipped = 0
+        for text in texts:
+            if not text.strip():
+                continue
+            try:
+                store.create_record(origin, text)
+                added += 1
+            except sqlite3.IntegrityError:
+                # Already there: UNIQUE(origin, text)
+                skipped += 1
+    finally:
+        store.close()
+    print(f"{added} records added to {origin}, {skipped} already there", file=sys.stderr)
+
+
+def cmd_list(args):
+    store = open_store(args.db, readonly=True)
+    try:
+        checked_key(args.key, birth_year_of(store))
+        records = store.fetch_record_list(args.list, args.key[:-1], args.key)
+        for record in records:
+            text = record.text if args.text else record.title
+            print(f"{record.id}\t{record.origin}\t{text}")
+    finally:
+        store.close()
+
+
+def cmd_select(args):
+    store = open_store(args.db)
+    try:
+        checked_key(args.key, birth_year_of(store))
+        if not store.get_record(args.record_id):
+            raise SystemExit(f"No record {args.record_id}")
+        selected = store.toggle_selection(args.record_id, args.key)
+    finally:
+        store.close()
+    print(f"{args.record_id} {'selected for' if selected else 'no longer selected for'} {args.key or 'Lifetime'}")
+
+
+def cmd_stats(args):
+    store = open_store(args.db, readonly=True)
+    try:
+        birth_year = birth_year_of(store)
+        checked_key(args.key, birth_year)
+        node_keys = [args.key] + TimeNode(args.key).descendant_keys(1)
+        node_stats = store.fetch_node_stats(node_keys)
+    finally:
+        store.close()
+    print("key\trecords\tselected\tflagged\ttimeframe")
+    for key in node_keys:
+        stats = node_stats.get(key)
+        if stats:
+            label = timeframe_label(key, birth_year)
+            print(f"{key or '-'}\t{stats.record_count}\t{stats.selected_count}\t{stats.flagged_count}\t{label}")
+
+
+def cmd_export(args):
+    from exporter import main as export_main
+
+    argv = ["--db", args.db, "--key", args.key, "--format", args.format]
+    if args.output:
+        argv += ["--output", args.output]
+    export_main(argv)
+
+
+def cmd_import(args):
+    from importer import main as import_main
+
+    argv = [*args.paths, "--db", args.db]
+    if args.birthdate:
+        argv += ["--birthdate", args.birthdate]
+    import_main(argv)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default=DB_PATH)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add records, read one per line from stdin without texts")
+    add.add_argument("texts", nargs="*", help='record texts, "[title]body"')
+    where = add.add_mutually_exclusive_group()
+    where.add_argument("--key", help="TimeNode key to file the records under")
+    where.add_argument("--at", help="ISO 8601 moment to file the records under, now by default")
+    add.add_argument("--birthdate", help="YYYY-MM-DD, stored if the database has none yet")
+    add.set_defaults(run=cmd_add)
+
+    list_ = commands.add_parser("list", help="records of one list with a node selected")
+    list_.add_argument("key")
+    list_.add_argument("--list", choices=RECORD_LISTS, default="Self")
+    list_.add_argument("--text", action="store_true", help="print whole texts instead of titles")
+    list_.set_defaults(run=cmd_list)
+
+    select = commands.add_parser("select", help="select a record for a node, or detach it if selected")
+    select.add_argument("record_id", type=int)
+    select.add_argument("key")
+    select.set_defaults(run=cmd_select)
+
+    stats = commands.add_parser("stats", help="record counts of a node and its children")
+    stats.add_argument("key", nargs="?", default="")
+    stats.set_defaults(run=cmd_stats)
+
+    export = commands.add_parser("export", help="export a subtree, see exporter.py")
+    export.add_argument("--key", default="")
+    export.add_argument("--format", choices=("jsonl", "md"), default="jsonl")
+    export.add_argument("-o", "--output")
+    export.set_defaults(run=cmd_export)
+
+    import_ = commands.add_parser("import", help="import diaries, see importer.py")
+    import_.add_argument("paths", nargs="+")
+    import_.add_argument("--birthdate")
+    import_.set_defaults(run=cmd_import)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.run(args)
+
+
+if __name__ == "__main__":
+    main()
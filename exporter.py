@@ -0,0 +1,118 @@
+"""Streaming export of a TimeNode subtree, or the whole lifetime, to JSONL or Markdown.
+
+    python exporter.py --db memory_map.db --format md > lifetime.md
+    python exporter.py --db memory_map.db --key CD --format jsonl -o 1996.jsonl
+
+Records come in origin order one at a time, so memory use does not grow with
+the export. JSONL lines carry "timestamp" and the raw "text" as well, so an
+export can be fed back to importer.py.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+from contextlib import closing
+
+from memory_store import MemoryStore, get_body
+from timenode import TimeNode, timeframe_label
+
+FORMATS = ("jsonl", "md")
+
+# Markdown has six heading levels; deeper timeframes reuse the last one
+MAX_HEADING = 6
+
+
+def export_jsonl(records, birth_year, out):
+    count = 0
+    origin = None
+    for record, selected_for in records:
+        if record.origin != origin:
+            # Records arrive grouped by origin: label each origin once
+            origin = record.origin
+            label = timeframe_label(origin, birth_year)
+            timestamp = TimeNode.interval(origin, birth_year)[0].isoformat()
+        entry = {
+            "origin": origin,
+            "timeframe": label,
+            "timestamp": timestamp,
+            "title": record.title,
+            "body": get_body(record.text),
+            "text": record.text,
+            "show_above": record.show_above,
+            "show_below": record.show_below,
+            "selected_for": selected_for,
+        }
+        out.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+
+def export_markdown(records, birth_year, out, key=""):
+    """Nest records under one heading per timeframe from key down to their origin."""
+    count = 0
+    previous = key
+    out.write(f"# {timeframe_label(key, birth_year)}\n\n")
+    for record, _ in records:
+        origin = record.origin
+        shared = len(key)
+        while shared < min(len(origin), len(previous)) and origin[shared] == previous[shared]:
+            shared += 1
+        for length in range(shared + 1, len(origin) + 1):
+            heading = "#" * min(length - len(key) + 1, MAX_HEADING)
+            out.write(f"{heading} {timeframe_label(origin[:length], birth_year)}\n\n")
+        previous = origin
+
+        body = get_body(record.text).strip()
+        out.write(f"**{record.title}**\n\n")
+        if body:
+            out.write(f"{body}\n\n")
+        count += 1
+    return count
+
+
+def export_subtree(store, key, out, fmt="jsonl"):
+    """Write every record under key ("" for the lifetime) to out; returns how many."""
+    birthdate = store.get_birthdate()
+    if not birthdate:
+        raise ValueError("No birthdate set, nothing to place records against")
+    TimeNode.interval(key, birthdate.year)  # rejects invalid keys before writing anything
+
+    # Closed here, so its cursor never outlives the store even when out breaks
+    with closing(store.iter_subtree(key)) as records:
+        if fmt == "md":
+            return export_markdown(records, birthdate.year, out, key)
+        return export_jsonl(records, birthdate.year, out)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--db", default="memory_map.db")
+    parser.add_argument("--key", default="", help="TimeNode key of the subtree, the whole lifetime by default")
+    parser.add_argument("--format", choices=FORMATS, default="jsonl")
+    parser.add_argument("-o", "--output", help="file to write, stdout by default")
+    args = parser.parse_args(argv)
+
+    try:
+        store = MemoryStore.open_reader(args.db)
+    except sqlite3.OperationalError as e:
+        raise SystemExit(f"Cannot open {args.db}: {e}")
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        count = export_subtree(store, args.key, out, args.format)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    except BrokenPipeError:
+        # The reader went away, e.g. `| head`: stop quietly, and keep the
+        # interpreter from failing again while flushing stdout at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        raise SystemExit(1)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+        store.close()
+    print(f"{count} records exported", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
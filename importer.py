@@ -0,0 +1,227 @@
+"""Streaming import of existing diaries into the memory map.
+
+    python importer.py journal.md notes.txt entries.jsonl --db memory_map.db
+
+Text and Markdown files hold one entry per dated line; the lines up to the
+next dated line belong to it:
+
+    2014-06-01 18:30 Walked to the lighthouse
+    ## 2014-06-02 Title of a Markdown entry
+
+A dated Markdown heading turns the rest of the heading into the "[title]".
+JSONL files hold one object per line with a "timestamp" (ISO 8601 or epoch
+seconds; "date", "time" and "created" work too) and either the full "text"
+or a "body" ("content" works too) with an optional "title". A valid TimeNode
+"origin" key, as written by exporter.py, wins over the timestamp.
+
+Entries are filed under the hour they happened in, or under their day when
+the timestamp has no time of day. Re-running an import adds nothing twice,
+as UNIQUE(origin, text) makes the repeated rows no-ops.
+"""
+import argparse
+import json
+import os
+import re
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+
+from memory_store import MemoryStore, title_sql
+from timenode import TimeNode
+
+BATCH_SIZE = 50000
+
+DAY_DEPTH = 6
+HOUR_DEPTH = 8
+
+# "2014-06-01", "2014-06-01 18:30", "2014-06-01T18:30:05", optionally after a Markdown heading
+DATED_LINE = re.compile(
+    r"^(?P<heading>#{1,6}\s+)?(?P<stamp>\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}(?::\d{2})?)?)\s*[-:]?\s*(?P<rest>.*)$"
+)
+# Titles are filled in right away, as the title trigger is off during bulk inserts
+INSERT_RECORD = f"INSERT OR IGNORE INTO record (origin, text, title) VALUES (?1, ?2, {title_sql('?2')})"
+
+TIMESTAMP_FIELDS = ("timestamp", "date", "time", "created")
+BODY_FIELDS = ("body", "content")
+
+
+@dataclass
+class ImportResult:
+    read: int = 0
+    inserted: int = 0
+    # Entries without a usable timestamp or dated before the birth year
+    skipped: int = 0
+
+
+def parse_timestamp(value):
+    """(moment, has_time) for an ISO 8601 string or epoch seconds; None if unreadable."""
+    try:
+        if isinstance(value, (int, float)):
+            return datetime.fromtimestamp(value), True
+        value = value.strip()
+        if value.endswith("Z"):
+            value = value[:-1] + "+00:00"
+        moment = datetime.fromisoformat(value)
+    except (ValueError, TypeError, OverflowError, OSError, AttributeError):
+        return None
+    if moment.tzinfo:
+        moment = moment.replace(tzinfo=None)
+    return moment, len(value) > 10
+
+
+def join_entry(title, lines):
+    body = "\n".join(lines).strip()
+    return f"[{title}]{body}" if title else body
+
+
+def read_dated_text(path):
+    """Yield (timestamp, text, None) for every dated entry of a text or Markdown file."""
+    with open(path, encoding="utf-8") as f:
+        stamp, title, lines = None, "", []
+        for line in f:
+            match = DATED_LINE.match(line.rstrip("\n"))
+            if match:
+                if stamp:
+                    yield stamp, join_entry(title, lines), None
+                stamp = match["stamp"]
+                if match["heading"]:
+                    title, lines = match["rest"].strip(), []
+                else:
+                    title, lines = "", [match["rest"]]
+            elif stamp:
+                lines.append(line.rstrip("\n"))
+        if stamp:
+            yield stamp, join_entry(title, lines), None
+
+
+def first_field(entry, fields, default):
+    for field in fields:
+        if field in entry:
+            return entry[field]
+    return default
+
+
+def read_jsonl(path):
+    """Yield (timestamp, text, origin) for every line of a JSONL file; unusable lines give Nones."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                yield None, None, None
+                continue
+            if not isinstance(entry, dict):
+                yield None, None, None
+                continue
+            stamp = first_field(entry, TIMESTAMP_FIELDS, None)
+            if "text" in entry:
+                text = str(entry["text"])
+            else:
+                body = str(first_field(entry, BODY_FIELDS, "")).strip()
+                title = entry.get("title")
+                text = f"[{title}]{body}" if title else body
+            yield stamp, text, entry.get("origin")
+
+
+def read_entries(paths):
+    for path in paths:
+        if os.path.splitext(path)[1].lower() in (".jsonl", ".ndjson"):
+            yield from read_jsonl(path)
+        else:
+            yield from read_dated_text(path)
+
+
+def valid_origin(origin, birth_year):
+    if not origin or not isinstance(origin, str):
+        return False
+    try:
+        TimeNode.interval(origin, birth_year)
+    except ValueError:
+        return False
+    return True
+
+
+def record_rows(entries, birth_year, result):
+    """Turn (timestamp, text, origin) entries into (origin, text) rows, counting what is skipped."""
+    first_moment = datetime(birth_year, 1, 1)
+    for stamp, text, origin in entries:
+        result.read += 1
+        if text and valid_origin(origin, birth_year):
+            yield origin, text
+            continue
+        parsed = parse_timestamp(stamp) if stamp is not None else None
+        if not parsed or not text or parsed[0] < first_moment:
+            result.skipped += 1
+            continue
+        moment, has_time = parsed
+        yield TimeNode.key_for(moment, birth_year, HOUR_DEPTH if has_time else DAY_DEPTH), text
+
+
+def import_files(store, paths, batch_size=BATCH_SIZE, progress=None):
+    """Insert the entries of paths into store in one bulk transaction.
+
+    progress(result) is called after every batch of batch_size rows.
+    """
+    birthdate = store.get_birthdate()
+    if not birthdate:
+        raise ValueError("No birthdate set, import needs one to place entries")
+
+    result = ImportResult()
+    rows = record_rows(read_entries(paths), birthdate.year, result)
+    with store.bulk_insert() as cursor:
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                break
+            # Rows in key order land next to each other in the origin indexes
+            batch.sort()
+            cursor.executemany(INSERT_RECORD, batch)
+            result.inserted += cursor.rowcount
+            if progress:
+                progress(result)
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("paths", nargs="+", help="text, Markdown or JSONL files")
+    parser.add_argument("--db", default="memory_map.db")
+    parser.add_argument("--birthdate", help="YYYY-MM-DD, stored if the database has none yet")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    args = parser.parse_args(argv)
+    if args.birthdate:
+        try:
+            datetime.strptime(args.birthdate, "%Y-%m-%d")
+        except ValueError as e:
+            raise SystemExit(f"Invalid --birthdate {args.birthdate!r}: {e}")
+
+    store = MemoryStore(args.db)
+    if args.birthdate and not store.get_birthdate():
+        store.set_birthdate(args.birthdate)
+
+    started = time.perf_counter()
+
+    def summary(result):
+        return f"{result.read} read, {result.inserted} new, {result.skipped} skipped"
+
+    def report(result):
+        # Progress rewrites one line in a terminal; logs only get the final summary
+        print(f"\r{summary(result)}", end="", file=sys.stderr)
+
+    progress = report if sys.stderr.isatty() else None
+    try:
+        result = import_files(store, args.paths, args.batch_size, progress)
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        store.close()
+    start = "\r" if progress else ""
+    print(f"{start}{summary(result)} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
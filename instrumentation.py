@@ -0,0 +1,151 @@
+"""Opt-in timings of the refresh pipeline.
+
+    MEMORIES_PROFILE=1 python memories.py                   # overlay in the status bar
+    MEMORIES_PROFILE_JSON=profile.json python memories.py   # plus a JSON dump every few seconds
+
+While disabled, phase() hands back one shared no-op context manager and
+nothing is attached to the SQLite connection, so the hooks cost a method
+call each. While enabled, every refresh becomes a frame holding the time of
+each phase and the SQL statements run and rows fetched by the GUI thread.
+Worker threads are never counted.
+"""
+import os
+import threading
+import time
+from collections import deque
+from contextlib import nullcontext
+
+HISTORY = 200
+NO_PHASE = nullcontext()
+
+
+class Phase:
+    __slots__ = ("profiler", "name", "started")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.profiler.add_time(self.name, (time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class Profiler:
+    def __init__(self, history=HISTORY):
+        self.enabled = False
+        self.frames = deque(maxlen=history)
+        self.frame = None
+        self.depth = 0
+        self.thread = None
+
+    def enable(self):
+        self.enabled = True
+
+    def attach(self, conn):
+        """Count the statements conn runs; only has an effect once enabled."""
+        if self.enabled:
+            conn.set_trace_callback(self.statement)
+
+    def counting(self):
+        return self.frame is not None and threading.get_ident() == self.thread
+
+    def statement(self, sql):
+        if self.counting():
+            self.frame["statements"] += 1
+
+    def add_rows(self, count):
+        if self.counting():
+            self.frame["rows"] += count
+
+    def add_time(self, name, ms):
+        if self.counting():
+            phases = self.frame["phases"]
+            phases[name] = phases.get(name, 0.0) + ms
+
+    def phase(self, name):
+        """Context manager timing name within the current frame."""
+        if self.frame is None or not self.enabled:
+            return NO_PHASE
+        return Phase(self, name)
+
+    def begin(self, name):
+        """Open a frame; nested begins fold into the outer frame."""
+        if not self.enabled:
+            return
+        self.depth += 1
+        if self.depth > 1:
+            return
+        self.thread = threading.get_ident()
+        self.frame = {
+            "name": name,
+            "at": time.time(),
+            "total_ms": 0.0,
+            "phases": {},
+            "statements": 0,
+            "rows": 0,
+            "started": time.perf_counter(),
+        }
+
+    def end(self):
+        if not self.enabled or not self.depth:
+            return None
+        self.depth -= 1
+        if self.depth:
+            return None
+        frame, self.frame = self.frame, None
+        frame["total_ms"] = (time.perf_counter() - frame.pop("started")) * 1000
+        self.frames.append(frame)
+        return frame
+
+    def summary(self):
+        """Median, mean and max of the total, each phase, statements and rows per frame name."""
+        import statistics
+
+        by_name = {}
+        for frame in self.frames:
+            figures = by_name.setdefault(frame["name"], {})
+            for key, value in [
+                ("total_ms", frame["total_ms"]),
+                ("statements", frame["statements"]),
+                ("rows", frame["rows"]),
+                *frame["phases"].items(),
+            ]:
+                figures.setdefault(key, []).append(value)
+        return {
+            name: {
+                key: {
+                    "median": statistics.median(values),
+                    "mean": statistics.fmean(values),
+                    "max": max(values),
+                }
+                for key, values in figures.items()
+            }
+            | {"frames": len(figures["total_ms"])}
+            for name, figures in by_name.items()
+        }
+
+    def dump(self, path):
+        import json
+
+        data = {"written_at": time.time(), "summary": self.summary(), "frames": list(self.frames)}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def format_frame(frame):
+    """One line for the overlay, e.g. "refresh 12.1 ms | grid 3.0 | ... | 9 SQL, 120 rows"."""
+    phases = " | ".join(f"{name} {ms:.1f}" for name, ms in frame["phases"].items())
+    return (
+        f"{frame['name']} {frame['total_ms']:.1f} ms | {phases} | "
+        f"{frame['statements']} SQL, {frame['rows']} rows"
+    )
+
+
+profiler = Profiler()
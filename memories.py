@@ -1,8 +1,8 @@
+import logging
+import os
+import signal
 import sys
-import sqlite3
-import re
 from datetime import datetime
-from dateutil.relativedelta import relativedelta, MO
 from PyQt5.QtWidgets import (
     QApplication,
     QMainWindow,
@@ -11,92 +11,411 @@ from PyQt5.QtWidgets import (
     QHBoxLayout,
     QLabel,
     QPushButton,
-    QScrollArea,
     QLineEdit,
-    QCheckBox,
     QMessageBox,
     QInputDialog,
     QSizePolicy,
+    QTableView,
+    QHeaderView,
+    QAbstractItemView,
+    QStyledItemDelegate,
+    QStyleOptionButton,
+    QStyle,
+    QListWidget,
+    QListWidgetItem,
+    QTabWidget,
 )
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, QEvent, QTimer, QRectF
+from PyQt5.QtGui import QColor, QPainter, QPalette
 
-W, H = 1920, 1080-200
+from instrumentation import profiler, format_frame
+from memory_store import MemoryStore, NodeStats, GridSummary, get_title, get_body
+from prefetch import Prefetcher, grid_entry, lists_entry
+from timenode import TimeNode, ValidityWindow, timeframe_label
+from zoommap import ZoomMap, heat_alpha
 
-conn = sqlite3.connect("memory_map.db")
-cursor = conn.cursor()
+W, H = 1920, 1080-200
 
-cursor.execute(
+# Writes are committed in one transaction once clicks pause for FLUSH_DELAY_MS,
+# and never wait longer than MAX_FLUSH_DELAY seconds while clicks keep coming
+FLUSH_DELAY_MS = 300
+MAX_FLUSH_DELAY = 2.0
+SEARCH_DELAY_MS = 150
+# How often to look for commits of other windows and scripts on the same database
+WATCH_INTERVAL_MS = 1000
+PROFILE_DUMP_MS = 5000
+# How often Python gets control back from Qt to run signal handlers
+SIGNAL_POLL_MS = 500
+
+logger = logging.getLogger(__name__)
+
+# Rows of cells used to lay out a given number of children
+GRID_STRUCTURES = {
+    9: [3, 3, 3],
+    10: [2, 3, 3, 2],
+    4: [2, 2],
+    3: [1, 2],
+    8: [3, 2, 3],
+}
+
+
+def grid_structure(count):
+    return GRID_STRUCTURES.get(count, [12])
+
+
+def grid_rects(area, count, spacing):
+    """Rects of count cells laid out in the rows of grid_structure(count) across area."""
+    structure = grid_structure(count)
+    row_height = max(0.0, (area.height() - spacing * (len(structure) - 1)) / len(structure))
+    rects = []
+    for row_index, row in enumerate(structure):
+        row = min(row, count - len(rects))
+        if row <= 0:
+            break
+        width = (area.width() - spacing * (row - 1)) / row
+        top = area.top() + row_index * (row_height + spacing)
+        for column in range(row):
+            rects.append(QRectF(area.left() + column * (width + spacing), top, width, row_height))
+    return rects
+
+
+class ChildCanvas(QWidget):
+    """Children of the current parent with their own children inside, painted in one pass.
+
+    Cell geometry is computed once per level and size, never while painting.
+    set_cell repaints just the rect of that cell, and clicks are hit-tested
+    against the child rects.
     """
-    CREATE TABLE IF NOT EXISTS user (
-        id INTEGER PRIMARY KEY,
-        birthdate TEXT NOT NULL
-    )
-"""
-)
 
-RAW_QUERY_ID = 0
-RAW_QUERY_ORIGIN = 1
-RAW_QUERY_TEXT = 2
-RAW_QUERY_SHOW_ABOVE = 3
-RAW_QUERY_SHOW_BELOW = 4
-RAW_QUERY_SELECTED_LIST = 5
+    HEAT_COLOR = (255, 140, 0)
+    SPACING = 6
+    NESTED_SPACING = 3
+    PADDING = 4
+    LABEL_LINES = 2
+    # Elided texts kept between refreshes, as most cells keep their text
+    ELIDED_CACHE = 4096
 
-cursor.execute(
-    """
-    CREATE TABLE IF NOT EXISTS record (
-        id INTEGER PRIMARY KEY,
-        origin TEXT NOT NULL,
-        text TEXT NOT NULL,
-        show_above BOOLEAN NOT NULL DEFAULT 0,
-        show_below BOOLEAN NOT NULL DEFAULT 0,
-        selected_list TEXT,
-        UNIQUE(origin, text)
-    )
-"""
-)
-conn.commit()
+    def __init__(self, on_select):
+        super().__init__()
+        self.on_select = on_select
+        self.parent_key = ""
+        self.selected_key = None
+        self.enabled_keys = set()
+        self.child_keys = []
+        # level -> [(key suffix, cell rect, text rect)] at the current size
+        self.geometry = {}
+        # key -> (cell rect, text rect) for every child and grandchild shown
+        self.rects = {}
+        # key -> (text, heat alpha) as last set
+        self.cells = {}
+        # (text, width, lines) -> text elided to fit
+        self.elided = {}
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.setMinimumSize(320, 240)
 
+    @property
+    def keys(self):
+        return self.rects.keys()
+
+    def show_node(self, parent_key, selected_key, enabled_keys):
+        self.parent_key = parent_key
+        self.selected_key = selected_key
+        self.enabled_keys = set(enabled_keys)
+        self.cells = {}
+        self.place_cells()
+        self.update()
+
+    def place_cells(self):
+        level = len(self.parent_key)
+        if level not in self.geometry:
+            self.geometry[level] = self.layout_level(level)
+        self.rects = {
+            self.parent_key + suffix: (rect, text_rect) for suffix, rect, text_rect in self.geometry[level]
+        }
+        self.child_keys = [key for key in self.rects if len(key) == level + 1]
+
+    def layout_level(self, level):
+        """Geometry of the children and grandchildren of any node at level."""
+        node = TimeNode("A" * level)
+        letters = node.get_child_letters()
+        padding = self.PADDING
+        label_height = self.LABEL_LINES * self.fontMetrics().lineSpacing()
+        area = QRectF(self.rect()).adjusted(self.SPACING, self.SPACING, -self.SPACING, -self.SPACING)
+
+        geometry = []
+        for letter, rect in zip(letters, grid_rects(area, len(letters), self.SPACING)):
+            inner = rect.adjusted(padding, padding, -padding, -padding)
+            label = QRectF(inner.left(), inner.top(), inner.width(), label_height)
+            geometry.append((letter, rect.toAlignedRect(), label.toAlignedRect()))
+
+            nested_letters = TimeNode(node.key + letter).get_child_letters()
+            nested_area = inner.adjusted(0, label_height + self.NESTED_SPACING, 0, 0)
+            for nested_letter, nested_rect in zip(
+                nested_letters, grid_rects(nested_area, len(nested_letters), self.NESTED_SPACING)
+            ):
+                nested_rect = nested_rect.toAlignedRect()
+                geometry.append((letter + nested_letter, nested_rect, nested_rect.adjusted(2, 0, -2, 0)))
+        return geometry
+
+    def set_cell(self, key, text, heat):
+        if self.cells.get(key) == (text, heat):
+            return
+        self.cells[key] = (text, heat)
+        self.update(self.rects[key][0].adjusted(-1, -1, 1, 1))
+
+    def elided_text(self, text, rect):
+        metrics = self.fontMetrics()
+        max_lines = max(1, rect.height() // metrics.lineSpacing())
+        entry = (text, rect.width(), max_lines)
+        if entry not in self.elided:
+            if len(self.elided) >= self.ELIDED_CACHE:
+                self.elided.clear()
+            lines = text.split("\n")[:max_lines]
+            self.elided[entry] = "\n".join(metrics.elidedText(line, Qt.ElideRight, rect.width()) for line in lines)
+        return self.elided[entry]
+
+    def key_at(self, pos):
+        for key in self.child_keys:
+            if self.rects[key][0].contains(pos):
+                return key
+        return None
 
-class TimeNode:
-    LEVELS = [
-        ("decade", 9, "years", 10),  # 0: A-I (0-8) representing 10-year spans
-        ("year", 10, "years", 1),  # 1: A-J (0-9) years in decade
-        ("quarter", 4, "months", 3),  # 2: A-D (0-3) quarters
-        ("month", 3, "months", 1),  # 3: A-C (0-2) months in quarter
-        ("week", 4, "days", 7),  # 4: A-D (0-3) ~week spans
-        ("day", 8, "days", 1),  # 5: A-H (0-7) days in week span
-        ("day_part", 3, "hours", 8),  # 6: A-C (0-2) 8-hour parts
-        ("hour", 8, "hours", 1),  # 7: A-H (0-7) hours in part
-    ]
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        palette = self.palette()
+        colors = {
+            group: {
+                role: palette.color(group, role)
+                for role in (QPalette.Mid, QPalette.Button, QPalette.Highlight, QPalette.ButtonText, QPalette.HighlightedText)
+            }
+            for group in (QPalette.Active, QPalette.Disabled)
+        }
+        heat_color = QColor(*self.HEAT_COLOR)
+        dirty = event.rect()
+        child_length = len(self.parent_key) + 1
+        # Children come before their own children, so nested cells paint on top
+        for key, (rect, text_rect) in self.rects.items():
+            if not rect.intersects(dirty):
+                continue
+            is_child = len(key) == child_length
+            selected = key == self.selected_key
+            group_colors = colors[QPalette.Active if is_child and key in self.enabled_keys else QPalette.Disabled]
+
+            text, heat = self.cells.get(key, ("", 0))
+            painter.setPen(group_colors[QPalette.Mid])
+            painter.setBrush(group_colors[QPalette.Highlight if selected else QPalette.Button])
+            painter.drawRect(rect)
+            if heat:
+                heat_color.setAlpha(heat)
+                painter.fillRect(rect.adjusted(1, 1, 0, 0), heat_color)
+
+            painter.setPen(group_colors[QPalette.HighlightedText if selected else QPalette.ButtonText])
+            painter.drawText(
+                text_rect,
+                (Qt.AlignLeft | Qt.AlignTop) if is_child else Qt.AlignCenter,
+                self.elided_text(text, text_rect),
+            )
 
-    def __init__(self, key=""):
-        self.key = key
-        self.level = len(key)
+    def resizeEvent(self, event):
+        self.geometry = {}
+        self.elided = {}
+        self.place_cells()
+        super().resizeEvent(event)
 
-    @property
-    def max_children(self):
-        return self.LEVELS[self.level][1] if self.level < 8 else 0
+    def mouseReleaseEvent(self, event):
+        key = self.key_at(event.pos())
+        if event.button() == Qt.LeftButton and key in self.enabled_keys:
+            self.on_select(key[-1])
 
-    def get_child_letters(self):
-        if self.level >= 8:
-            return []
-        base = ord("A")
-        return [chr(base + i) for i in range(self.max_children)]
+
+class RecordListModel(QAbstractTableModel):
+    """Records of one of the right-hand lists, one row per record.
+
+    Only the rows a view actually paints are ever turned into text, so long
+    High TF / Low TF lists cost no widgets at all. Records come with their
+    stored title only; a record loads its text when its body is first shown.
+    """
+
+    TITLE, BODY, EDIT, ABOVE, BELOW, SELECT, DELETE = range(7)
+    BUTTON_COLUMNS = (EDIT, SELECT, DELETE)
+
+    def __init__(self, app):
+        super().__init__()
+        self.app = app
+        self.records = []
+        self.node = None
+        self.is_select_possible = True
+
+    def set_records(self, records, node, is_select_possible):
+        self.beginResetModel()
+        self.records = records
+        self.node = node
+        self.is_select_possible = is_select_possible
+        self.endResetModel()
+
+    def row_of(self, record_id):
+        for row, record in enumerate(self.records):
+            if record.id == record_id:
+                return row
+        return None
+
+    def patch_record(self, record_id, record, is_member=None):
+        """Redraw, add or drop the row of one record; is_member None keeps membership as is."""
+        row = self.row_of(record_id)
+        if row is None:
+            if is_member and record is not None:
+                self.beginInsertRows(QModelIndex(), len(self.records), len(self.records))
+                self.records.append(record)
+                self.endInsertRows()
+        elif is_member is False or record is None:
+            self.beginRemoveRows(QModelIndex(), row, row)
+            del self.records[row]
+            self.endRemoveRows()
+        else:
+            self.records[row] = record
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.records)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else 7
+
+    def record_text(self, record):
+        if record.id in self.app.unpushed_commits:
+            return self.app.unpushed_commits[record.id]
+        return record.text or ""
+
+    def record_title(self, record):
+        if record.id in self.app.unpushed_commits:
+            return self.app.get_title(self.app.unpushed_commits[record.id])
+        return record.title
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self.records[index.row()]
+        column = index.column()
+
+        if role in (Qt.DisplayRole, Qt.EditRole):
+            if column == self.TITLE:
+                return self.record_title(record)
+            if column == self.BODY:
+                return self.app.get_body(self.record_text(record))
+            if column == self.EDIT:
+                return "E"
+            if column == self.ABOVE:
+                return "▲"
+            if column == self.BELOW:
+                return "▼"
+            if column == self.SELECT:
+                return "Select" if self.is_select_possible else "Detach"
+            if column == self.DELETE:
+                return "Delete"
+        elif role == Qt.CheckStateRole:
+            if column == self.ABOVE:
+                return Qt.Checked if record.show_above else Qt.Unchecked
+            if column == self.BELOW:
+                return Qt.Checked if record.show_below else Qt.Unchecked
+        return None
+
+    def flags(self, index):
+        column = index.column()
+        if column in (self.TITLE, self.BODY):
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsEditable
+        if column in (self.ABOVE, self.BELOW):
+            return Qt.ItemIsEnabled | Qt.ItemIsUserCheckable
+        if column == self.EDIT and self.records[index.row()].id not in self.app.unpushed_commits:
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled
+
+    def setData(self, index, value, role=Qt.EditRole):
+        record = self.records[index.row()]
+        column = index.column()
+
+        if role == Qt.CheckStateRole and column == self.ABOVE:
+            self.app.set_check_above(value, record, self.node)
+            return True
+        if role == Qt.CheckStateRole and column == self.BELOW:
+            self.app.set_check_below(value, record, self.node)
+            return True
+        if role == Qt.EditRole and column in (self.TITLE, self.BODY):
+            title_index = self.index(index.row(), self.TITLE)
+            body_index = self.index(index.row(), self.BODY)
+            changed_title = value if column == self.TITLE else self.data(title_index)
+            changed_text = value if column == self.BODY else self.data(body_index)
+            self.app.record_edited(record, self.node, changed_title, changed_text)
+            self.dataChanged.emit(title_index, self.index(index.row(), self.EDIT))
+            return True
+        return False
+
+    def button_clicked(self, index):
+        record = self.records[index.row()]
+        if index.column() == self.EDIT:
+            self.app.push_record_edit(record, self.node)
+        elif index.column() == self.SELECT:
+            self.app.select_record(record, self.node)
+        elif index.column() == self.DELETE:
+            self.app.delete_record(record, self.node)
+
+
+class ButtonDelegate(QStyledItemDelegate):
+    """Paints a push button in a cell and hands clicks on it to the model."""
+
+    def paint(self, painter, option, index):
+        button = QStyleOptionButton()
+        button.rect = option.rect.adjusted(2, 2, -2, -2)
+        button.text = index.data()
+        button.state = QStyle.State_Raised
+        if index.flags() & Qt.ItemIsEnabled:
+            button.state |= QStyle.State_Enabled
+        style = option.widget.style() if option.widget else QApplication.style()
+        style.drawControl(QStyle.CE_PushButton, button, painter, option.widget)
+
+    def editorEvent(self, event, model, option, index):
+        if (
+            event.type() == QEvent.MouseButtonRelease
+            and event.button() == Qt.LeftButton
+            and option.rect.contains(event.pos())
+            and index.flags() & Qt.ItemIsEnabled
+        ):
+            model.button_clicked(index)
+            return True
+        return super().editorEvent(event, model, option, index)
 
 
 class MemoryApp(QMainWindow):
-    def __init__(self):
+    def __init__(self, store, profile_path=None):
         super().__init__()
-        print("super().__init__() OK")
+        self.store = store
+        self.store.write_behind = True
+        self.flush_timer = QTimer(self)
+        self.flush_timer.setSingleShot(True)
+        self.flush_timer.setInterval(FLUSH_DELAY_MS)
+        self.flush_timer.timeout.connect(self.flush_writes)
+        self.prefetcher = Prefetcher(store)
         self.current_parent = TimeNode()
         self.selected_child = None
         self.user_birthdate = self.get_user_birthdate()
         self.user_birth_year = datetime(year = self.user_birthdate.year, month=1,day=1)
+        self.validity = ValidityWindow(self.user_birthdate, self.user_birth_year.year)
         self.init_ui()
         self.unpushed_commits = {}
-        print("init_ui OK")
+        self.store.add_listener(self.apply_change)
+        self.watch_timer = QTimer(self)
+        self.watch_timer.setInterval(WATCH_INTERVAL_MS)
+        self.watch_timer.timeout.connect(self.sync_external)
+        self.watch_timer.start()
+
+        self.profile_path = profile_path
+        if profile_path:
+            self.profile_timer = QTimer(self)
+            self.profile_timer.setInterval(PROFILE_DUMP_MS)
+            self.profile_timer.timeout.connect(lambda: profiler.dump(profile_path))
+            self.profile_timer.start()
+
         self.refresh_view()
-        print("refresh_view OK")
+        logger.debug("MemoryApp ready")
 
     def init_ui(self):
         self.setWindowTitle("Memory Map")
@@ -114,9 +433,14 @@ class MemoryApp(QMainWindow):
 
         left_layout.addWidget(self.parent_label)
 
-        self.child_grid = QVBoxLayout()
-        self.child_grid_widgets = []
-        left_layout.addLayout(self.child_grid)
+        # The grid of the current node, and the whole lifetime on a zoomable timeline
+        self.child_grid = ChildCanvas(self.select_child)
+        self.zoom_map = ZoomMap(self.store, self.validity, self.go_to_node)
+        self.map_tabs = QTabWidget()
+        self.map_tabs.addTab(self.child_grid, "Grid")
+        self.map_tabs.addTab(self.zoom_map, "Timeline")
+        self.map_tabs.currentChanged.connect(self.map_tab_changed)
+        left_layout.addWidget(self.map_tabs)
 
         left_layout.addStretch(1)
 
@@ -140,6 +464,25 @@ class MemoryApp(QMainWindow):
         right_content = QWidget()
         self.right_layout = QVBoxLayout(right_content)
 
+        # Search
+        self.search_input = QLineEdit()
+        self.search_input.setPlaceholderText("Search memories")
+        self.search_timer = QTimer(self)
+        self.search_timer.setSingleShot(True)
+        self.search_timer.setInterval(SEARCH_DELAY_MS)
+        self.search_timer.timeout.connect(self.run_search)
+        self.search_input.textEdited.connect(lambda _: self.search_timer.start())
+        self.search_input.returnPressed.connect(self.run_search)
+        self.search_results = QListWidget()
+        self.search_results.setMaximumHeight(H // 6)
+        self.search_results.hide()
+        self.search_results.itemActivated.connect(self.open_search_hit)
+        self.search_results.itemClicked.connect(self.open_search_hit)
+        self.search_input.setEnabled(self.store.has_search)
+        self.prefetcher.signals.searched.connect(self.show_search_hits)
+        self.right_layout.addWidget(self.search_input)
+        self.right_layout.addWidget(self.search_results)
+
         # Record creation
         self.record_input = QLineEdit()
         # self.record_input.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
@@ -154,264 +497,216 @@ class MemoryApp(QMainWindow):
         for list_name in ["Selected", "Self", "High TF", "Low TF"]:
             lbl = QLabel(list_name)
             self.right_layout.addWidget(lbl)
-            scroll = QScrollArea()
-            content = QWidget()
-            right_scrollables_layout = QVBoxLayout(content)
-            scroll.setWidget(content)
-            scroll.setWidgetResizable(True)
-            self.list_widgets[list_name] = (scroll, right_scrollables_layout)
-            self.right_layout.addWidget(scroll)
+            model = RecordListModel(self)
+            view = QTableView()
+            view.setModel(model)
+            view.horizontalHeader().hide()
+            view.verticalHeader().hide()
+            view.setSelectionMode(QAbstractItemView.NoSelection)
+            view.setEditTriggers(
+                QAbstractItemView.DoubleClicked
+                | QAbstractItemView.EditKeyPressed
+                | QAbstractItemView.AnyKeyPressed
+            )
+            view.setItemDelegateForColumn(RecordListModel.EDIT, ButtonDelegate(view))
+            view.setItemDelegateForColumn(RecordListModel.SELECT, ButtonDelegate(view))
+            view.setItemDelegateForColumn(RecordListModel.DELETE, ButtonDelegate(view))
+            header = view.horizontalHeader()
+            header.setSectionResizeMode(QHeaderView.ResizeToContents)
+            header.setSectionResizeMode(RecordListModel.TITLE, QHeaderView.Stretch)
+            header.setSectionResizeMode(RecordListModel.BODY, QHeaderView.Stretch)
+            self.list_widgets[list_name] = (view, model)
+            self.right_layout.addWidget(view)
 
 
 
         layout.addWidget(left_panel, 1)
         layout.addWidget(right_content, 1)
 
+        # Debug overlay with the figures of the last refresh
+        self.profile_label = None
+        if profiler.enabled:
+            self.profile_label = QLabel()
+            self.statusBar().addPermanentWidget(self.profile_label)
+
     def get_title(self, record_text):
-        match = re.search(r'\[(.*?)\]', record_text)
+        return get_title(record_text)
 
-        if match:
-            return match.group(1)
-        return record_text[:12]+"..."
-    
     def get_body(self, record_text):
-        match = re.search(r'\[(.*?)\]', record_text)
-
-        title = ""
-        if match:
-            title = match.group(1)
-        
-        if title:
-            return record_text.replace("["+title+"]", "")
-        else:
-            return record_text
-
-    def prepare_childs_layout(self, not_nested_parent, nested_parent = None):
-
-        parent = not_nested_parent if not_nested_parent else nested_parent
-
-        layout_prepared = QVBoxLayout()
-
-        letters = parent.get_child_letters()
-
-        grid_structure = []
-        if len(letters) == 9:
-            grid_structure = [3, 3, 3]
-        elif len(letters) == 10:
-            grid_structure = [2, 3, 3, 2]
-        elif len(letters) == 4:
-            grid_structure = [2, 2]
-        elif len(letters) == 3:
-            grid_structure = [1, 2]
-        elif len(letters) == 8:
-            grid_structure = [3, 2, 3]
-        else:
-            grid_structure = [12]
-
-        button_idx = 0
-        for row in grid_structure:
-            current_child_layout = QHBoxLayout()
-            for col in range(row):
-
-                if button_idx >= len(letters):
-                    break
-
-                letter = letters[button_idx]
-
-                selected_records = self.fetch_selected_for_record(
-                    parent.key + letter
-                )
-
-                btn_text = ""
-                selected_record_text = ""
-                if selected_records:
-                    selected_record_text = self.get_title(selected_records[0][RAW_QUERY_TEXT])
-                
-                btn_text = self.get_timeframe_label(None, parent.key + letter)+ "\n" + selected_record_text
-                
-                if nested_parent:
-                    btn = QPushButton(btn_text)
-                else:
-                    btn = QPushButton()
-                
-                child_time_node = TimeNode(parent.key + letter)
-                if not nested_parent:
-                    btn.setMinimumHeight(H//len(grid_structure))
-                    btn.setCheckable(True)
-                    btn.clicked.connect(lambda _, l=letter: self.select_child(l))
-                    parent_layout = QVBoxLayout()
-                    parent_layout.addWidget(QLabel(btn_text))
-                    nested_layout = self.prepare_childs_layout(None, child_time_node)
-                    parent_layout.addLayout(nested_layout)
-                    btn.setLayout(parent_layout)
-                
-                if nested_parent:
-                    btn.setEnabled(False)
-                    
-                childs_validity = list(self.is_valid_child(child_time_node.key+_) for _ in child_time_node.get_child_letters())
-                any_valid_childs = True in childs_validity
-                # TODO - process leafes
-                if not any_valid_childs:
-                    btn.setEnabled(False)
-
-                if not nested_parent:
-                    self.child_grid_widgets.append(btn)
-
-                current_child_layout.addWidget(btn)
-                button_idx += 1
-
-            
-            layout_prepared.addLayout(current_child_layout)
-        
-        return layout_prepared
-        
+        return get_body(record_text)
+
+    def prepare_childs_layout(self, parent, selected_titles, node_stats, best_titles):
+        self.grid_titles = dict(selected_titles)
+        self.grid_stats = dict(node_stats)
+        self.grid_best = dict(best_titles)
+        # TODO - process leafes
+        enabled_keys = [
+            parent.key + letter
+            for letter in parent.get_child_letters()
+            if self.validity.has_valid_child(parent.key + letter)
+        ]
+        self.child_grid.show_node(parent.key, self.selected_child, enabled_keys)
+        self.paint_cells(self.child_grid.keys)
+
+    def heat_scale(self):
+        """Largest record count among the children and among the grandchildren on the grid."""
+        max_counts = {}
+        for key in self.child_grid.keys:
+            count = self.grid_stats.get(key, NodeStats()).record_count
+            max_counts[len(key)] = max(max_counts.get(len(key), 0), count)
+        return max_counts
+
+    def paint_cells(self, keys):
+        max_counts = self.heat_scale()
+        for key in keys:
+            count = self.grid_stats.get(key, NodeStats()).record_count
+            self.child_grid.set_cell(
+                key,
+                self.get_cell_text(key, self.grid_titles, self.grid_stats, self.grid_best),
+                heat_alpha(count, max_counts[len(key)]),
+            )
 
+    def patch_cells(self, node_keys):
+        """Reload and repaint the visible cells of node_keys, or every cell if the heat scale moved."""
+        keys = [key for key in node_keys if key in self.child_grid.rects]
+        if not keys:
+            return
 
+        old_scale = self.heat_scale()
+        titles = self.store.fetch_titles_selected_for(keys)
+        stats = self.store.fetch_node_stats(keys)
+        best = self.store.fetch_best_titles(keys)
+        for key in keys:
+            self.grid_titles[key] = titles.get(key, [])
+            self.grid_stats[key] = stats.get(key, NodeStats())
+            self.grid_best[key] = best.get(key, "")
+        self.paint_cells(self.child_grid.keys if self.heat_scale() != old_scale else keys)
+
+    def get_cell_text(self, key, selected_titles, node_stats, best_titles):
+        # Without a selection the cell shows the best memory from node_best
+        selected_record_text = best_titles.get(key, "")
+        if selected_titles.get(key):
+            selected_record_text = selected_titles[key][0]
+        label = self.get_timeframe_label(None, key)
+        record_count = node_stats.get(key, NodeStats()).record_count
+        if record_count:
+            label += f"  ({record_count})"
+        return label + "\n" + selected_record_text
 
     def refresh_view(self):
-        for child_widget in self.child_grid_widgets:
-            if child_widget:
-                child_widget.deleteLater()
-        self.child_grid_widgets = []
-
-        # Update parent label
-        self.parent_label.setText(self.get_timeframe_label(self.current_parent))
+        profiler.begin("refresh")
+        try:
+            self.validity.refresh()
 
+            # Update parent label
+            self.parent_label.setText(self.get_timeframe_label(self.current_parent))
 
-        self.child_grid.addLayout(self.prepare_childs_layout(self.current_parent))
+            with profiler.phase("grid fetch"):
+                grid = self.fetch(grid_entry(self.current_parent.key)) or GridSummary({}, {})
+            with profiler.phase("grid widgets"):
+                self.prepare_childs_layout(self.current_parent, grid.selected_titles, grid.node_stats, grid.best_titles)
+            self.zoom_map.set_selected(self.selected_child)
 
+            # Update navigation buttons
+            self.btn_up.setEnabled(self.current_parent.level > 0)
+            self.btn_down.setEnabled(
+                bool(self.selected_child and self.current_parent.level < 7)
+            )
 
+            # Update right panel
+            self.update_record_lists()
 
-        # Update navigation buttons
-        self.btn_up.setEnabled(self.current_parent.level > 0)
-        self.btn_down.setEnabled(
-            bool(self.selected_child and self.current_parent.level < 7)
-        )
+            with profiler.phase("prefetch"):
+                self.prefetcher.prefetch_around(self.current_parent, self.selected_child, self.is_valid_child)
+        finally:
+            self.show_profile(profiler.end())
 
-        # Update right panel
-        self.update_record_lists()
+        logger.debug("refresh_view %r / %r", self.current_parent.key, self.selected_child)
 
-        print("refresh_view() refreshed")
+    def show_profile(self, frame):
+        if frame and self.profile_label:
+            self.profile_label.setText(format_frame(frame))
 
     def select_child(self, letter):
-        print(f"Select child triggered {self.current_parent.key} {letter}")
+        logger.debug("select_child %r %r", self.current_parent.key, letter)
         self.selected_child = self.current_parent.key + letter
         self.refresh_view()
 
-    def select_record(self, record, node_key):
-        current_selection_string = record["selected_list"]
-        entities = set(current_selection_string.split(","))
-
-        if node_key in entities:
-            entities.remove(node_key)
-        else:
-            entities.add(node_key)
+    # Mutations patch the view through apply_change, called back by the store
 
-        # entities.add(node_key)
-        updated_selection_string = "," + ",".join([_ for _ in entities]) + ","
-        updated_selection_string = updated_selection_string.replace(",,", ",")
-
-        cursor.execute(
-            """
-            UPDATE record 
-            SET selected_list = ?
-            WHERE id = ?
-            """,
-            (updated_selection_string, record["id"]),
-        )
-
-        # Commit and close
-        conn.commit()
-
-        self.refresh_view()
+    def select_record(self, record, node_key):
+        self.store.toggle_selection(record.id, node_key)
+        self.schedule_flush()
 
     def delete_record(self, record, node_key):
-        rec_id = record["id"]
-        print(f" DELETE record id is {rec_id}")
-
-        record_id = str(record["id"])
+        logger.debug("delete_record %s", record.id)
 
-        cursor.execute('DELETE FROM record WHERE id = ?',[record_id])
-
-        # Commit and close
-        conn.commit()
-
-        self.refresh_view()
+        self.store.delete_record(record.id)
+        self.unpushed_commits.pop(record.id, None)
+        self.schedule_flush()
 
     def set_check_above(self, state, record, node_key):
         is_checked = False if state == 0 else 1
-        cursor.execute(
-            """
-            UPDATE record 
-            SET show_above = ?
-            WHERE id = ?
-            """,
-            (is_checked, record["id"]),
-        )
-
-        conn.commit()
-
-        self.refresh_view()
+        self.store.set_show_above(record.id, is_checked)
+        self.schedule_flush()
 
     def set_check_below(self, state, record, node_key):
-        print("set_check_below called")
         is_checked = False if state == 0 else 1
-        cursor.execute(
-            """
-            UPDATE record 
-            SET show_below = ?
-            WHERE id = ?
-            """,
-            (is_checked, record["id"]),
-        )
+        self.store.set_show_below(record.id, is_checked)
+        self.schedule_flush()
 
-        conn.commit()
+    def push_record_edit(self, record, node):
 
-        self.refresh_view()
+        updated_text = self.unpushed_commits[record.id]
+        del self.unpushed_commits[record.id]
 
-    def fetch_selected_for_record(self, identification_string):
-        cursor.execute(
-            """
-            SELECT * FROM record
-            WHERE ',' || selected_list || ',' LIKE '%,' || ? || ',%'
-        """,
-            (identification_string,),
-        )
-
-        results = cursor.fetchall()
-        if results:
-            print(results)
-        return results
-    
-    def push_record_edit(self, record, node, edit_btn):
-
-        updated_text = self.unpushed_commits[record["id"]]
-        del self.unpushed_commits[record["id"]]
-        edit_btn.setEnabled(False)
-
-        cursor.execute(
-            """
-            UPDATE record 
-            SET text = ?
-            WHERE id = ?
-            """,
-            (updated_text, record["id"]),
-        )
-
-        conn.commit()
+        self.store.update_text(record.id, updated_text)
+        self.schedule_flush()
 
-        self.refresh_view()
+    def apply_change(self, change):
+        """Patch the rows and grid cells one record write touched instead of refreshing everything."""
+        profiler.begin(f"patch {change.kind}")
+        try:
+            with profiler.phase("grid cells"):
+                self.patch_cells(change.node_keys)
+            if change.node_keys:
+                self.zoom_map.invalidate(change.node_keys)
+            if not self.selected_child:
+                return
+
+            with profiler.phase("list rows"):
+                memberships = change.memberships(self.current_parent.key, self.selected_child)
+                for name, (view, model) in self.list_widgets.items():
+                    model.patch_record(change.record_id, change.record, memberships.get(name))
+        finally:
+            self.show_profile(profiler.end())
+
+    def sync_external(self):
+        """Patch the parts of the view that other connections changed since the last poll."""
+        changes = self.store.poll_changes()
+        if not changes:
+            return
 
-    
-    def record_edited(self, record, node, title_field, text_field, edit_btn):
-        original_text = record["text"]
-        print(f"original_text = {original_text}")
-        updated_text = ""
+        self.prefetcher.invalidate()
+        if changes.everything:
+            self.zoom_map.invalidate()
+            self.refresh_view()
+            return
 
-        changed_title = title_field.text()
-        print(f"changed_title = {changed_title}")
-        changed_text = text_field.text()
-        print(f"changed_text = {changed_text}")
+        profiler.begin("external")
+        try:
+            with profiler.phase("grid cells"):
+                self.patch_cells(changes.node_keys)
+            self.zoom_map.invalidate(changes.node_keys)
+            if self.selected_child and changes.touches_lists(self.current_parent.key, self.selected_child):
+                self.update_record_lists()
+        finally:
+            self.show_profile(profiler.end())
+        logger.debug("sync_external %d records", len(changes.record_ids))
+
+    def record_edited(self, record, node, changed_title, changed_text):
+        original_text = record.text
+        updated_text = ""
 
         if changed_text.startswith(changed_title.replace("...", "")) or not changed_title:
             changed_title = ""
@@ -419,130 +714,40 @@ class MemoryApp(QMainWindow):
         
         else:
             updated_text = "["+changed_title+"]"+changed_text
-        
-        print(updated_text)
-        print(original_text)
-        
+
+        logger.debug("record_edited %s: %r -> %r", record.id, original_text, updated_text)
+
         if updated_text == original_text:
-            if edit_btn.isEnabled():
-                edit_btn.setEnabled(False)
-            if record["id"] in self.unpushed_commits:
-                del self.unpushed_commits[record["id"]]
+            if record.id in self.unpushed_commits:
+                del self.unpushed_commits[record.id]
             return
 
-        edit_btn.setEnabled(True)
-        
-        self.unpushed_commits[record["id"]] = updated_text
+        self.unpushed_commits[record.id] = updated_text
 
 
 
     def update_record_lists(self):
-        for name, (scroll, layout) in self.list_widgets.items():
-            records = []
-            while layout.count():
-                item = layout.takeAt(0)
-                if item.widget():
-                    item.widget().deleteLater()
-
-            if not self.selected_child:
-                continue
-
-            is_select_possible = True
-
-            if name == "Self":
-                records = self.get_records(origin=self.selected_child)
-            elif name == "Selected":
-                records = self.get_records(selected_list=self.selected_child)
-                is_select_possible = False
-            elif name == "High TF":
-                print("Fetching high TF: preparing Query")
-                records = self.get_records(show_below_parent=self.current_parent.key)
-                records = [_ for _ in records if _["origin"] != self.selected_child]
-            elif name == "Low TF":
-                records = self.get_records(show_above_child=self.selected_child)
-                records = [_ for _ in records if _["origin"] != self.selected_child]
-            else:
-                records = []
-
-            for record in records:
-                widget = QWidget()
-                record_layout = QHBoxLayout(widget)
-
-                title = QLineEdit(self.get_title(record["text"]))
-                text = QLineEdit(self.get_body(record["text"]))
-
-                edit_btn = QPushButton("E")
-                if record["id"] in self.unpushed_commits:
-                    edit_btn.setEnabled(True)
-                else:
-                    edit_btn.setEnabled(False)
-
-                edit_btn.clicked.connect(lambda btn_pyqt_inner_state, r=record, n=self.selected_child, _edit_btn=edit_btn: self.push_record_edit(
-                        r, n, _edit_btn
-                    )
-                )
-                
-                title.textEdited.connect(
-                    lambda new_text, r=record, n=self.selected_child, _title=title, _text=text, _edit_btn=edit_btn: self.record_edited(
-                        r, n, _title, _text, _edit_btn
-                    )
-                )
-
-                text.textEdited.connect(
-                    lambda new_text, r=record, n=self.selected_child, _title=title, _text=text, _edit_btn=edit_btn: self.record_edited(
-                        r, n, _title, _text, _edit_btn
-                    )
-                )
-                
+        record_lists = {}
+        if self.selected_child:
+            with profiler.phase("lists fetch"):
+                record_lists = self.fetch(lists_entry(self.current_parent.key, self.selected_child)) or {}
 
+        with profiler.phase("lists models"):
+            for name, (view, model) in self.list_widgets.items():
+                if not self.selected_child:
+                    model.set_records([], None, True)
+                    continue
 
-                check_above = QCheckBox("▲")
-                check_above.setChecked(record["show_above"])
-                check_above.stateChanged.connect(
-                    lambda state, r=record, n=self.selected_child: self.set_check_above(
-                        state, r, n
-                    )
-                )
-                check_below = QCheckBox("▼")
-                check_below.setChecked(record["show_below"])
-                check_below.stateChanged.connect(
-                    lambda state, r=record, n=self.selected_child: self.set_check_below(
-                        state, r, n
-                    )
-                )
-                select_btn = QPushButton("Select" if is_select_possible else "Detach")
-                select_btn.clicked.connect(
-                    lambda _, r=record, n=self.selected_child: self.select_record(r, n)
-                )
-                delete_btn = QPushButton("Delete")
-                delete_btn.clicked.connect(
-                    lambda _, r=record, n=self.selected_child: self.delete_record(r, n)
-                )
-
-                record_layout.addWidget(title)
-                record_layout.addWidget(text)
-                record_layout.addWidget(edit_btn)
-                record_layout.addWidget(check_above)
-                record_layout.addWidget(check_below)
-                record_layout.addWidget(select_btn)
-                record_layout.addWidget(delete_btn)
-
-                layout.addWidget(widget)
+                model.set_records(list(record_lists.get(name, [])), self.selected_child, name != "Selected")
 
     def create_record(self):
         text = self.record_input.text()
         if not text or not self.selected_child:
             return
 
-        cursor.execute(
-            """
-            INSERT INTO record (origin, text) VALUES (?, ?)
-        """,
-            (self.selected_child, text),
-        )
-        conn.commit()
+        self.store.create_record(self.selected_child, text)
+        self.schedule_flush()
         self.record_input.clear()
-        self.update_record_lists()
 
     def go_up(self):
         if self.current_parent.level > 0:
@@ -556,199 +761,127 @@ class MemoryApp(QMainWindow):
             self.selected_child = None
             self.refresh_view()
 
-    # Helper methods
-    def get_user_birthdate(self):
-        cursor.execute("SELECT birthdate FROM user LIMIT 1")
-        result = cursor.fetchone()
-        if not result:
-            birthdate, ok = QInputDialog.getText(
-                self, "Setup", "Enter birthdate (YYYY-MM-DD):"
+    def go_to_node(self, key):
+        self.current_parent = TimeNode(key[:-1])
+        self.selected_child = key
+        self.refresh_view()
+
+    def run_search(self):
+        self.search_timer.stop()
+        if self.store.has_pending:
+            # The search runs on a worker, which only sees committed records
+            self.flush_writes()
+        self.prefetcher.search(self.search_input.text())
+
+    def show_search_hits(self, text, hits):
+        self.search_results.clear()
+        for record in hits:
+            item = QListWidgetItem(
+                f"{self.get_timeframe_label(None, record.origin)}  {record.title}"
             )
-            if ok:
-                cursor.execute("INSERT INTO user (birthdate) VALUES (?)", (birthdate,))
-                conn.commit()
-                return datetime.strptime(birthdate, "%Y-%m-%d")
-        return datetime.strptime(result[0], "%Y-%m-%d") if result else None
+            item.setData(Qt.UserRole, record.origin)
+            self.search_results.addItem(item)
+        self.search_results.setVisible(bool(hits))
+
+    def map_tab_changed(self, index):
+        if self.map_tabs.widget(index) is self.zoom_map:
+            self.zoom_map.show_key(self.selected_child or self.current_parent.key)
+
+    def open_search_hit(self, item):
+        self.go_to_node(item.data(Qt.UserRole))
+
+    def schedule_flush(self):
+        self.prefetcher.invalidate()
+        self.setWindowTitle("Memory Map *")
+        if self.store.pending_seconds() >= MAX_FLUSH_DELAY:
+            self.flush_writes()
+        else:
+            self.flush_timer.start()
+
+    def flush_writes(self):
+        self.flush_timer.stop()
+        self.store.flush()
+        self.setWindowTitle("Memory Map")
+        self.prefetcher.prefetch_around(self.current_parent, self.selected_child, self.is_valid_child)
+
+    def closeEvent(self, event):
+        # Not flush_writes: it would queue more prefetches right before the shutdown
+        self.flush_timer.stop()
+        self.store.flush()
+        self.prefetcher.shutdown()
+        if self.profile_path:
+            profiler.dump(self.profile_path)
+        super().closeEvent(event)
 
+    # Helper methods
     def get_timeframe_label(self, node, key=""):
         key = key if key else node.key
-        if not key:
-            return "Lifetime"
-
-        try:
-            start_date = self.user_birth_year
-            end_date = self.user_birth_year
-            for level, (name, count, unit, amount) in enumerate(TimeNode.LEVELS):
-                if level >= len(key):
-                    break
-
-                char = key[level]
-                idx = ord(char) - ord("A")
-
-                # Calculate time span for this level
-                if unit == "years":
-                    start_date += relativedelta(**{unit: idx * amount})
-                    end_date = start_date + relativedelta(**{unit: amount})
-                elif unit == "months":
-                    start_date += relativedelta(months=idx * amount)
-                    end_date = start_date + relativedelta(months=amount)
-                elif unit == "days":
-                    start_date += relativedelta(days=idx * amount)
-                    end_date = start_date + relativedelta(days=amount)
-                elif unit == "hours":
-                    start_date += relativedelta(hours=idx * amount)
-                    end_date = start_date + relativedelta(hours=amount)
-
-            # TODO lables are better - still could be cleaned up
-            if key and len(key) == 1:
-                return f"{start_date.strftime('%Y')} - {end_date.strftime('%Y')}"
-            elif key and len(key) == 2:
-                return f"{start_date.strftime('%Y')}"
-                # return f"{start_date.strftime('%Y')} - {end_date.strftime('%Y')}"
-            elif key and len(key) == 3:
-                return f"{start_date.strftime('%Y')} : {start_date.strftime('%b')} - {end_date.strftime('%b')}"
-            elif key and len(key) == 4:
-                return f"{start_date.strftime('%Y')} : {start_date.strftime('%b')}"
-            elif key and len(key) == 5:
-                return f"{start_date.strftime('%Y')} {start_date.strftime('%b')} : {start_date.strftime('%d')} - {end_date.strftime('%d')}"
-            elif key and len(key) == 6:
-                return f"{start_date.strftime('%Y')} {start_date.strftime('%b')} {start_date.strftime('%d')}"
-            elif key and len(key) == 7:
-                return f"{start_date.strftime('%Y')} {start_date.strftime('%b')} {start_date.strftime('%d')} : {start_date.strftime('%H')} - {end_date.strftime('%H')}"
-            elif key and len(key) == 8:
-                return f"{start_date.strftime('%Y')} {start_date.strftime('%b')} {start_date.strftime('%d')} : {start_date.strftime('%H')}"
-            else:
-                return f"{start_date.strftime('%Y-%m-%d %H')} - {end_date.strftime('%Y-%m-%d %H')}"
-        except Exception as e:
-            return f"Timeframe Error: {str(e)}"
+        return timeframe_label(key, self.user_birth_year.year)
 
     def is_valid_child(self, test_key):
         try:
             if not self.user_birthdate:
-                print("No birthdate error?")
+                logger.warning("is_valid_child called without a birthdate")
                 return False
-            
-            now = datetime.now()
-
-            current_date = self.user_birth_year
-            for level, (_, count, unit, amount) in enumerate(TimeNode.LEVELS):
-                if level >= len(test_key):
-                    break
-
-                idx = ord(test_key[level]) - ord("A")
-                if unit == "years":
-                    current_date += relativedelta(years=idx * amount)
-                elif unit == "months":
-                    current_date += relativedelta(months=idx * amount)
-                elif unit == "days":
-                    current_date += relativedelta(days=idx * amount)
-                elif unit == "hours":
-                    current_date += relativedelta(hours=idx * amount)
-
-            return current_date <= now and current_date >= self.user_birthdate
-        except Exception as e:
-            print(f"is_valid_child exception {e}")
+
+            return self.validity.is_valid(test_key)
+        except Exception:
+            logger.exception("is_valid_child failed for %r", test_key)
             return False
 
-    def get_records(
-        self,
-        origin=None,
-        selected_list=None,
-        show_below_parent=None,
-        show_above_child=None,
-    ):
+    def fetch(self, entry):
+        """Grid summary or record lists from the prefetch cache, or the store on a miss."""
         try:
-            queries = []
-            params = []
-
-            if origin:
-                queries.append("origin = ?")
-                params.append(origin)
-
-            if selected_list:
-                queries.append(
-                    f"',' || selected_list || ',' LIKE '%,{selected_list},%'"
-                )
-
-            if show_below_parent:
-                print(f"Fetching high TF: show_below_parent = {show_below_parent}")
-                while show_below_parent:
-                    queries.append(
-                        "(origin = ? AND show_below = 1)"
-                    )
-                    params.append(show_below_parent)
-                    show_below_parent = show_below_parent[
-                        :-1
-                    ]  # ABCDF - query -> ABCD - query -> ABC - query -> AB - query -> A - query -> end of loop
-
-            if show_above_child:
-                # ABCDF -> ABCDFE,True query, ABC,True not query, ABCDFA,False not query, ABCDAA,True not query
-                queries.append("(origin LIKE ? || '%' AND show_above = 1)")
-                params.append(show_above_child)
-
-            if not queries:
-                return []
-
-            where_clause = " AND ".join(queries) if queries else "1=1"
-
-            cursor.execute(
-                f"""
-                SELECT * 
-                FROM record 
-                WHERE {where_clause}
-            """,
-                params,
-            )
-
-            result = [
-                {
-                    "id": row[RAW_QUERY_ID],
-                    "origin": row[RAW_QUERY_ORIGIN],
-                    "text": row[RAW_QUERY_TEXT],
-                    "show_above": bool(row[RAW_QUERY_SHOW_ABOVE]),
-                    "show_below": bool(row[RAW_QUERY_SHOW_BELOW]),
-                    "selected_list": row[RAW_QUERY_SELECTED_LIST] or "",
-                }
-                for row in cursor.fetchall()
-            ]
-
-            for rec in result:
-                if rec["id"] in self.unpushed_commits:
-                    rec["text"] = self.unpushed_commits[rec["id"]]
-
-            return result 
+            return self.prefetcher.get(entry)
         except Exception as e:
             QMessageBox.critical(self, "Database Error", str(e))
-            return []
+            return None
 
     def get_user_birthdate(self):
-        cursor.execute("SELECT birthdate FROM user LIMIT 1")
-        result = cursor.fetchone()
-        if not result:
+        birthdate = self.store.get_birthdate()
+        if not birthdate:
             birthdate, ok = QInputDialog.getText(
                 self, "Setup", "Enter birthdate (YYYY-MM-DD):"
             )
             if ok and birthdate:
                 try:
-                    dt = datetime.strptime(birthdate, "%Y-%m-%d")
-                    cursor.execute(
-                        "INSERT INTO user (birthdate) VALUES (?)", (birthdate,)
-                    )
-                    conn.commit()
-                    self.refresh_view()
-                    return dt
+                    return self.store.set_birthdate(birthdate)
                 except Exception as e:
                     QMessageBox.critical(
                         self, "Error", f"Invalid date format: {str(e)}"
                     )
                     return self.get_user_birthdate()
-        elif result:
-            return datetime.strptime(result[0], "%Y-%m-%d")
-        return None
+            return None
+        return birthdate
 
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=os.environ.get("MEMORIES_LOG_LEVEL", "WARNING").upper(),
+        format="%(asctime)s %(levelname)s %(name)s: %(message)s",
+    )
+    profile_path = os.environ.get("MEMORIES_PROFILE_JSON")
+    if os.environ.get("MEMORIES_PROFILE") or profile_path:
+        # Before the store opens, so its connection gets the statement counter
+        profiler.enable()
+
     app = QApplication(sys.argv)
-    ex = MemoryApp()
+    store = MemoryStore("memory_map.db")
+
+    def excepthook(*exc_info):
+        # Keep pending writes if a slot raises, instead of letting Qt abort the process
+        store.flush()
+        sys.__excepthook__(*exc_info)
+
+    sys.excepthook = excepthook
+    ex = MemoryApp(store, profile_path)
+    # SIGTERM on logout or shutdown skips atexit: quit the event loop instead,
+    # so aboutToQuit flushes the pending writes
+    app.aboutToQuit.connect(store.flush)
+    signal.signal(signal.SIGTERM, lambda *_: app.quit())
+    # Python only runs signal handlers between bytecodes, so wake it up now and then
+    signal_timer = QTimer()
+    signal_timer.timeout.connect(lambda: None)
+    signal_timer.start(SIGNAL_POLL_MS)
     ex.show()
     sys.exit(app.exec_())
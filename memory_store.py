@@ -0,0 +1,1381 @@
+import atexit
+import re
+import sqlite3
+import time
+import weakref
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, FrozenSet, Iterable, Iterator, List, Optional, Tuple
+
+from instrumentation import profiler
+from timenode import KEY_LETTERS, TimeNode
+
+RAW_QUERY_ID = 0
+RAW_QUERY_ORIGIN = 1
+RAW_QUERY_TEXT = 2
+RAW_QUERY_SHOW_ABOVE = 3
+RAW_QUERY_SHOW_BELOW = 4
+RAW_QUERY_TITLE = 5
+
+RECORD_COLUMNS = "record.id, record.origin, record.text, record.show_above, record.show_below, record.title"
+# Everything but the text, for the lists and the grid; views load the text of shown rows
+SUMMARY_COLUMNS = "record.id, record.origin, NULL, record.show_above, record.show_below, record.title"
+
+SCHEMA_VERSION = 3
+# Tables and triggers a database at SCHEMA_VERSION has once create_schema ran on it
+SCHEMA_OBJECTS = (
+    "user",
+    "record",
+    "record_selection",
+    "node_stats",
+    "change_log",
+    "node_best",
+    "idx_record_best",
+    "record_fts",
+    "record_title_insert",
+    "record_title_update",
+)
+
+# Rows of change_log kept for other connections to catch up from
+CHANGE_LOG_KEEP = 10000
+
+# Shortest last word of a search that is matched as a prefix
+MIN_PREFIX = 3
+
+# Kinds of writes that may change which record is the best memory of the nodes above it
+ROLLUP_KINDS = ("text", "show_above", "selection")
+
+# Page cache for bulk inserts, in KiB: keeps the record indexes in memory while they grow
+BULK_CACHE_KIB = 256 * 1024
+
+# Record lists shown next to the grid, in display order
+RECORD_LISTS = ("Selected", "Self", "High TF", "Low TF")
+
+
+class Record:
+    """Immutable record row, slotted to keep thousands of them small.
+
+    Rows loaded through SUMMARY_COLUMNS come without their text; it is fetched
+    from the owning store on first access and kept. A change to a record gives
+    a new Record, so a loaded text never goes stale.
+    """
+
+    __slots__ = ("id", "origin", "show_above", "show_below", "title", "_text", "_store", "__weakref__")
+
+    def __init__(self, id, origin, text, show_above, show_below, title="", store=None):
+        init = object.__setattr__
+        init(self, "id", id)
+        init(self, "origin", origin)
+        init(self, "show_above", show_above)
+        init(self, "show_below", show_below)
+        init(self, "title", title)
+        init(self, "_text", text)
+        init(self, "_store", store)
+
+    @classmethod
+    def from_row(cls, row, store=None):
+        return cls(
+            id=row[RAW_QUERY_ID],
+            origin=row[RAW_QUERY_ORIGIN],
+            text=row[RAW_QUERY_TEXT],
+            show_above=bool(row[RAW_QUERY_SHOW_ABOVE]),
+            show_below=bool(row[RAW_QUERY_SHOW_BELOW]),
+            title=row[RAW_QUERY_TITLE],
+            store=store,
+        )
+
+    @property
+    def text(self) -> Optional[str]:
+        if self._text is None and self._store is not None:
+            object.__setattr__(self, "_text", self._store.get_text(self.id))
+        return self._text
+
+    def matches(self, row) -> bool:
+        """Whether row describes this record as it is."""
+        return (
+            self.origin == row[RAW_QUERY_ORIGIN]
+            and self.show_above == bool(row[RAW_QUERY_SHOW_ABOVE])
+            and self.show_below == bool(row[RAW_QUERY_SHOW_BELOW])
+            and self.title == row[RAW_QUERY_TITLE]
+            and (row[RAW_QUERY_TEXT] is None or self._text in (None, row[RAW_QUERY_TEXT]))
+        )
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Record is immutable")
+
+    def __eq__(self, other):
+        if not isinstance(other, Record):
+            return NotImplemented
+        return (self.id, self.origin, self.show_above, self.show_below, self.title) == (
+            other.id, other.origin, other.show_above, other.show_below, other.title
+        )
+
+    def __hash__(self):
+        return hash(self.id)
+
+    def __repr__(self):
+        return f"Record(id={self.id!r}, origin={self.origin!r}, title={self.title!r})"
+
+
+# "[title]body" convention. DOTALL makes the match the first "[" up to the next
+# "]", which is exactly what bracket_title_sql() computes inside SQLite.
+TITLE_PATTERN = re.compile(r'\[(.*?)\]', re.DOTALL)
+
+
+@dataclass(frozen=True)
+class NodeStats:
+    record_count: int = 0
+    # Selections pinned to this node or any node below it
+    selected_count: int = 0
+    # Records below this node with show_above or show_below set
+    flagged_count: int = 0
+
+
+@dataclass(frozen=True)
+class GridSummary:
+    """What the grid needs for one parent: selected titles and counts of its two levels below."""
+    selected_titles: Dict[str, List[str]]
+    node_stats: Dict[str, NodeStats]
+    # Title of the best memory of each node, shown where nothing is selected
+    best_titles: Dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class ChangeSet:
+    """Writes other connections committed, as read back from change_log."""
+    # Origins of records created, deleted or changed
+    origins: FrozenSet[str] = frozenset()
+    # Nodes records were selected for or detached from, or whose selected records changed text
+    selection_keys: FrozenSet[str] = frozenset()
+    record_ids: FrozenSet[int] = frozenset()
+    # Part of the log was pruned unseen, or a bulk insert ran: anything may have changed
+    everything: bool = False
+
+    @property
+    def node_keys(self) -> FrozenSet[str]:
+        """Nodes whose grid cell may show other counts or titles now."""
+        keys = set(self.selection_keys)
+        for origin in self.origins:
+            keys.update(TimeNode(origin).ancestor_keys())
+        return frozenset(keys)
+
+    def touches_lists(self, parent_key: str, child_key: str) -> bool:
+        """Whether any of RECORD_LISTS may have changed while child_key is selected under parent_key."""
+        return child_key in self.selection_keys or any(
+            origin.startswith(child_key) or parent_key.startswith(origin) for origin in self.origins
+        )
+
+
+@dataclass(frozen=True)
+class RecordChange:
+    """One write to a record, handed to store listeners so views can patch themselves.
+
+    kind is one of "created", "deleted", "text", "show_above", "show_below" or
+    "selection". record is the record after the write, None once deleted.
+    node_keys are the nodes whose grid cell shows other counts or titles now.
+    """
+    kind: str
+    record_id: int
+    origin: str
+    record: Optional[Record] = None
+    node_keys: FrozenSet[str] = frozenset()
+    # For "selection": the node the record was selected for or detached from
+    selection_key: Optional[str] = None
+    selected: bool = False
+
+    def memberships(self, parent_key: str, child_key: str) -> Dict[str, bool]:
+        """Lists of RECORD_LISTS the record may have joined or left, and whether it is in them now.
+
+        Lists missing from the result keep or lack the record as before; a
+        record still in one of them only needs its row redrawn.
+        """
+        if self.kind == "deleted":
+            return {name: False for name in RECORD_LISTS}
+        if self.kind == "created" and self.origin == child_key:
+            return {"Self": True}
+        if self.kind == "selection" and self.selection_key == child_key:
+            return {"Selected": self.selected}
+        if self.kind == "show_above" and self.origin.startswith(child_key) and self.origin != child_key:
+            return {"Low TF": self.record.show_above}
+        if self.kind == "show_below" and parent_key.startswith(self.origin) and self.origin != child_key:
+            return {"High TF": self.record.show_below}
+        return {}
+
+
+def get_title(record_text):
+    match = TITLE_PATTERN.search(record_text)
+
+    if match:
+        return match.group(1)
+    return record_text[:12]+"..."
+
+
+def get_body(record_text):
+    match = TITLE_PATTERN.search(record_text)
+
+    title = ""
+    if match:
+        title = match.group(1)
+
+    if title:
+        return record_text.replace("["+title+"]", "")
+    else:
+        return record_text
+
+
+def bracket_title_sql(text, fallback="''"):
+    """SQL expression for the "[title]" part of text, or fallback when there is none."""
+    opening = f"instr({text}, '[')"
+    rest = f"substr({text}, {opening} + 1)"
+    return (
+        f"(CASE WHEN {opening} > 0 AND instr({rest}, ']') > 0"
+        f" THEN substr({rest}, 1, instr({rest}, ']') - 1) ELSE {fallback} END)"
+    )
+
+
+def title_sql(text):
+    """SQL expression matching get_title()."""
+    return bracket_title_sql(text, f"substr({text}, 1, 12) || '...'")
+
+
+def body_sql(text):
+    """SQL expression matching get_body()."""
+    title = bracket_title_sql(text)
+    return f"(CASE WHEN {title} != '' THEN replace({text}, '[' || {title} || ']', '') ELSE {text} END)"
+
+
+def best_of_sql(key):
+    """(record_id, score) of the best memory of node key, for a row value assigned to node_best.
+
+    Compares the node's own best record, one seek on idx_record_best, with
+    the node_best rows of its children. The score ranks a selection first,
+    then show_above, then how many records share the origin, which is
+    node_best.own_count of the row being assigned.
+    """
+    children = ", ".join(f"{key} || '{letter}'" for letter in KEY_LETTERS)
+    return f"""
+        SELECT record_id, score FROM (
+            SELECT * FROM (
+                SELECT id AS record_id, best_rank << 32 | node_best.own_count AS score
+                FROM record WHERE origin = {key}
+                ORDER BY best_rank DESC, id
+                LIMIT 1
+            )
+            UNION ALL
+            SELECT record_id, score FROM node_best AS child WHERE child.node_key IN ({children})
+        )
+        ORDER BY score DESC, record_id
+        LIMIT 1"""
+
+
+def best_chain_sql(origin, record_id, delta):
+    """Statements updating node_best after record_id changed its rank under origin,
+    or joined it (delta 1) or left it (delta -1).
+
+    The origin's own node is ranked again. Each node above is only ranked
+    again when its winner is the written record, when its winner's score
+    moved with the count of records at origin, or when the child on the
+    path now beats it; every other node keeps its winner.
+    """
+    statements = []
+    if delta > 0:
+        statements.append(
+            f"""
+            INSERT INTO node_best (node_key, own_count) VALUES ({origin}, 1)
+            ON CONFLICT (node_key) DO UPDATE SET own_count = own_count + 1;"""
+        )
+    elif delta < 0:
+        statements.append(f"UPDATE node_best SET own_count = own_count - 1 WHERE node_key = {origin};")
+    statements.append(
+        f"UPDATE node_best SET (record_id, score) = ({best_of_sql(origin)}) WHERE node_key = {origin};"
+    )
+
+    winner_changed = [f"record_id = {record_id}"]
+    if delta:
+        winner_changed.append(f"(SELECT origin FROM record WHERE id = node_best.record_id) = {origin}")
+    for length in range(len(TimeNode.LEVELS) - 1, -1, -1):
+        key = f"substr({origin}, 1, {length})"
+        child = f"substr({origin}, 1, {length + 1})"
+        if delta > 0:
+            # A node with no records below it yet starts out with the child's best
+            statements.append(
+                f"""
+                INSERT OR IGNORE INTO node_best (node_key, record_id, score, own_count)
+                SELECT {key}, record_id, score, 0 FROM node_best
+                WHERE node_key = {child} AND length({origin}) > {length};"""
+            )
+        child_wins = f"""EXISTS (
+            SELECT 1 FROM node_best AS child WHERE child.node_key = {child}
+                AND (child.score, -child.record_id) > (node_best.score, -node_best.record_id)
+        )"""
+        statements.append(
+            f"""
+            UPDATE node_best SET (record_id, score) = ({best_of_sql(key)})
+            WHERE node_key = {key} AND length({origin}) > {length}
+                AND ({" OR ".join(winner_changed + [child_wins])});"""
+        )
+    if delta < 0:
+        prefixes = ", ".join(f"substr({origin}, 1, {length})" for length in range(len(TimeNode.LEVELS) + 1))
+        # Nodes left without any record below them
+        statements.append(f"DELETE FROM node_best WHERE node_key IN ({prefixes}) AND record_id IS NULL;")
+    return "".join(statements)
+
+
+def fts_query(text):
+    """Turn free text into an FTS5 query matching every word.
+
+    Only the last word, the one still being typed, is matched as a prefix,
+    and only from MIN_PREFIX characters on: a prefix of one or two letters
+    matches most records, and bm25 ranks every match before LIMIT applies.
+    """
+    words = re.findall(r"\w+", text)
+    terms = [f'"{word}"' for word in words]
+    if words and len(words[-1]) >= MIN_PREFIX:
+        terms[-1] += "*"
+    return " ".join(terms)
+
+
+class MemoryStore:
+    """Owns the memory_map.db connection and every query the app runs against it.
+
+    With write_behind set, mutations run inside an open transaction instead of
+    committing one by one. Reads on this connection already see them, and
+    flush() commits the whole group at once. Pending writes are also
+    committed on close() and at interpreter exit.
+
+    A readonly store opens an existing database without touching its schema,
+    for reading from other threads next to the main store.
+    """
+
+    def __init__(self, path="memory_map.db", write_behind=False, readonly=False):
+        self.path = path
+        self.write_behind = write_behind
+        self.readonly = readonly
+        self.pending_since = None
+        self.listeners = []
+        # Identity map: one Record per id while anything holds on to it
+        self.records = weakref.WeakValueDictionary()
+        self.seen_data_version = None
+        self.seen_change_id = 0
+        if readonly:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+            self.cursor = self.conn.cursor()
+            self.has_search = self.table_exists("record_fts")
+            return
+
+        self.conn = sqlite3.connect(path)
+        self.cursor = self.conn.cursor()
+        profiler.attach(self.conn)
+        # WAL lets readers carry on while a batch commits. FULL syncs the WAL on
+        # every commit, so even an OS crash keeps acknowledged writes; commits
+        # are batched, so the extra fsync is rare
+        self.cursor.execute("PRAGMA journal_mode = WAL")
+        self.cursor.execute("PRAGMA synchronous = FULL")
+        self.cursor.execute("PRAGMA foreign_keys = ON")
+        if self.schema_is_current():
+            # Nothing to create or migrate: short-lived stores skip all the DDL
+            self.has_search = True
+        else:
+            self.create_schema()
+        self.seen_data_version = self.data_version()
+        self.skip_own_changes()
+        atexit.register(self.flush)
+
+    def create_schema(self):
+        cursor = self.cursor
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user (
+                id INTEGER PRIMARY KEY,
+                birthdate TEXT NOT NULL
+            )
+        """
+        )
+
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS record (
+                id INTEGER PRIMARY KEY,
+                origin TEXT NOT NULL,
+                text TEXT NOT NULL,
+                show_above BOOLEAN NOT NULL DEFAULT 0,
+                show_below BOOLEAN NOT NULL DEFAULT 0,
+                selected_list TEXT,
+                title TEXT,
+                selection_count INTEGER NOT NULL DEFAULT 0,
+                best_rank INTEGER GENERATED ALWAYS AS ((selection_count > 0) << 1 | show_above) VIRTUAL,
+                UNIQUE(origin, text)
+            )
+        """
+        )
+
+        cursor.execute(
+            """
+            CREATE TABLE IF NOT EXISTS record_selection (
+                record_id INTEGER NOT NULL REFERENCES record(id) ON DELETE CASCADE,
+                node_key TEXT NOT NULL,
+                PRIMARY KEY (record_id, node_key)
+            )
+        """
+        )
+        # The primary key already indexes record_id lookups
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_record_selection_node ON record_selection(node_key)"
+        )
+        # High TF looks up exact ancestor origins, Low TF a range of descendant origins
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_record_show_below ON record(show_below, origin)"
+        )
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_record_show_above ON record(show_above, origin)"
+        )
+
+        self.migrate()
+        # A node's own best memory is the first entry of its origin
+        cursor.execute(
+            "CREATE INDEX IF NOT EXISTS idx_record_best ON record(origin, best_rank DESC)"
+        )
+
+        # title always holds get_title(text), so lists and the grid never parse texts
+        cursor.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS record_title_insert AFTER INSERT ON record
+            WHEN new.title IS NULL BEGIN
+                UPDATE record SET title = {title_sql("new.text")} WHERE id = new.id;
+            END
+        """
+        )
+        cursor.execute(
+            f"""
+            CREATE TRIGGER IF NOT EXISTS record_title_update AFTER UPDATE OF text ON record BEGIN
+                UPDATE record SET title = {title_sql("new.text")} WHERE id = new.id;
+            END
+        """
+        )
+
+        self.has_search = self.create_search_index()
+        self.create_node_stats()
+        self.create_change_log()
+        self.create_node_best()
+        self.conn.commit()
+
+    def create_node_stats(self):
+        """Create and fill node_stats, the per-prefix counts kept current by triggers.
+
+        Every record counts towards each prefix of its origin, "" included, so
+        the density of any node is a single primary key lookup.
+        """
+        cursor = self.cursor
+        if self.table_exists("node_stats"):
+            return
+
+        prefixes = "SELECT substr({key}, 1, length) FROM key_prefix WHERE length <= length({key})"
+        old_prefixes = prefixes.format(key="old.origin")
+        old_selection_prefixes = prefixes.format(key="old.node_key")
+        cursor.executescript(
+            f"""
+            BEGIN;
+            CREATE TABLE key_prefix (length INTEGER PRIMARY KEY);
+            INSERT INTO key_prefix (length) VALUES {", ".join(f"({n})" for n in range(len(TimeNode.LEVELS) + 1))};
+
+            CREATE TABLE node_stats (
+                node_key TEXT PRIMARY KEY,
+                record_count INTEGER NOT NULL DEFAULT 0,
+                selected_count INTEGER NOT NULL DEFAULT 0,
+                flagged_count INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER node_stats_record_insert AFTER INSERT ON record BEGIN
+                INSERT INTO node_stats (node_key, record_count, flagged_count)
+                SELECT substr(new.origin, 1, length), 1, (new.show_above OR new.show_below)
+                FROM key_prefix WHERE length <= length(new.origin)
+                ON CONFLICT (node_key) DO UPDATE SET
+                    record_count = record_count + 1,
+                    flagged_count = flagged_count + excluded.flagged_count;
+            END;
+
+            CREATE TRIGGER node_stats_record_delete AFTER DELETE ON record BEGIN
+                UPDATE node_stats SET
+                    record_count = record_count - 1,
+                    flagged_count = flagged_count - (old.show_above OR old.show_below)
+                WHERE node_key IN ({old_prefixes});
+                DELETE FROM node_stats
+                WHERE node_key IN ({old_prefixes})
+                    AND record_count = 0 AND selected_count = 0 AND flagged_count = 0;
+            END;
+
+            CREATE TRIGGER node_stats_record_update AFTER UPDATE OF origin, show_above, show_below ON record BEGIN
+                UPDATE node_stats SET
+                    record_count = record_count - 1,
+                    flagged_count = flagged_count - (old.show_above OR old.show_below)
+                WHERE node_key IN ({old_prefixes});
+                INSERT INTO node_stats (node_key, record_count, flagged_count)
+                SELECT substr(new.origin, 1, length), 1, (new.show_above OR new.show_below)
+                FROM key_prefix WHERE length <= length(new.origin)
+                ON CONFLICT (node_key) DO UPDATE SET
+                    record_count = record_count + 1,
+                    flagged_count = flagged_count + excluded.flagged_count;
+                DELETE FROM node_stats
+                WHERE node_key IN ({old_prefixes})
+                    AND record_count = 0 AND selected_count = 0 AND flagged_count = 0;
+            END;
+
+            CREATE TRIGGER node_stats_selection_insert AFTER INSERT ON record_selection BEGIN
+                INSERT INTO node_stats (node_key, selected_count)
+                SELECT substr(new.node_key, 1, length), 1
+                FROM key_prefix WHERE length <= length(new.node_key)
+                ON CONFLICT (node_key) DO UPDATE SET selected_count = selected_count + 1;
+            END;
+
+            CREATE TRIGGER node_stats_selection_delete AFTER DELETE ON record_selection BEGIN
+                UPDATE node_stats SET selected_count = selected_count - 1
+                WHERE node_key IN ({old_selection_prefixes});
+                DELETE FROM node_stats
+                WHERE node_key IN ({old_selection_prefixes})
+                    AND record_count = 0 AND selected_count = 0 AND flagged_count = 0;
+            END;
+
+            INSERT INTO node_stats (node_key, record_count, flagged_count)
+            SELECT substr(origin, 1, length), count(*), sum(show_above OR show_below)
+            FROM record JOIN key_prefix ON length <= length(origin)
+            GROUP BY 1;
+
+            INSERT INTO node_stats (node_key, selected_count)
+            SELECT substr(node_key, 1, length), count(*)
+            FROM record_selection JOIN key_prefix ON length <= length(node_key)
+            WHERE true
+            GROUP BY 1
+            ON CONFLICT (node_key) DO UPDATE SET selected_count = excluded.selected_count;
+            COMMIT;
+        """
+        )
+
+    def schema_is_current(self) -> bool:
+        """Whether the database is at SCHEMA_VERSION and has every SCHEMA_OBJECTS entry."""
+        self.cursor.execute("PRAGMA user_version")
+        if self.cursor.fetchone()[0] != SCHEMA_VERSION:
+            return False
+        self.cursor.execute(
+            f"SELECT count(*) FROM sqlite_master WHERE name IN ({', '.join('?' * len(SCHEMA_OBJECTS))})",
+            SCHEMA_OBJECTS,
+        )
+        return self.cursor.fetchone()[0] == len(SCHEMA_OBJECTS)
+
+    def create_change_log(self):
+        """Create change_log, where triggers note the nodes and records every write touches.
+
+        Other connections read it to patch just those parts of their views;
+        kind is "record" for a record's origin, "selection" for a node it is
+        selected for and "all" after a bulk insert. Only the last
+        CHANGE_LOG_KEEP rows are kept.
+        """
+        if self.table_exists("change_log"):
+            return
+
+        self.cursor.executescript(
+            f"""
+            BEGIN;
+            CREATE TABLE change_log (
+                id INTEGER PRIMARY KEY,
+                record_id INTEGER,
+                node_key TEXT NOT NULL,
+                kind TEXT NOT NULL
+            );
+
+            CREATE TRIGGER change_log_prune AFTER INSERT ON change_log
+            WHEN new.id % 1000 = 0 BEGIN
+                DELETE FROM change_log WHERE id <= new.id - {CHANGE_LOG_KEEP};
+            END;
+
+            CREATE TRIGGER change_log_record_insert AFTER INSERT ON record BEGIN
+                INSERT INTO change_log (record_id, node_key, kind) VALUES (new.id, new.origin, 'record');
+            END;
+
+            CREATE TRIGGER change_log_record_delete AFTER DELETE ON record BEGIN
+                INSERT INTO change_log (record_id, node_key, kind) VALUES (old.id, old.origin, 'record');
+            END;
+
+            CREATE TRIGGER change_log_record_update AFTER UPDATE OF origin, text, show_above, show_below ON record BEGIN
+                INSERT INTO change_log (record_id, node_key, kind) VALUES (new.id, new.origin, 'record');
+                INSERT INTO change_log (record_id, node_key, kind)
+                SELECT old.id, old.origin, 'record' WHERE old.origin != new.origin;
+                INSERT INTO change_log (record_id, node_key, kind)
+                SELECT record_id, node_key, 'selection' FROM record_selection
+                WHERE record_id = new.id AND old.text != new.text;
+            END;
+
+            CREATE TRIGGER change_log_selection_insert AFTER INSERT ON record_selection BEGIN
+                INSERT INTO change_log (record_id, node_key, kind) VALUES (new.record_id, new.node_key, 'selection');
+            END;
+
+            CREATE TRIGGER change_log_selection_delete AFTER DELETE ON record_selection BEGIN
+                INSERT INTO change_log (record_id, node_key, kind) VALUES (old.record_id, old.node_key, 'selection');
+            END;
+            COMMIT;
+        """
+        )
+
+    def create_node_best(self):
+        """Create and fill node_best, the best memory of every node that has any records.
+
+        Triggers keep it current along the origin of each written record and
+        the nodes above it, so the grid reads any node's headline with one
+        lookup. record.selection_count, kept by the triggers on
+        record_selection, feeds the indexed record.best_rank.
+        """
+        if self.table_exists("node_best"):
+            return
+
+        self.cursor.executescript(
+            f"""
+            BEGIN;
+            CREATE TABLE node_best (
+                node_key TEXT PRIMARY KEY,
+                record_id INTEGER,
+                score INTEGER,
+                -- Records whose origin is node_key itself
+                own_count INTEGER NOT NULL DEFAULT 0
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER record_selection_count_insert AFTER INSERT ON record_selection BEGIN
+                UPDATE record SET selection_count = selection_count + 1 WHERE id = new.record_id;
+            END;
+
+            CREATE TRIGGER record_selection_count_delete AFTER DELETE ON record_selection BEGIN
+                UPDATE record SET selection_count = selection_count - 1 WHERE id = old.record_id;
+            END;
+
+            CREATE TRIGGER node_best_record_insert AFTER INSERT ON record BEGIN
+                {best_chain_sql("new.origin", "new.id", 1)}
+            END;
+
+            CREATE TRIGGER node_best_record_delete AFTER DELETE ON record BEGIN
+                {best_chain_sql("old.origin", "old.id", -1)}
+            END;
+
+            CREATE TRIGGER node_best_record_update AFTER UPDATE OF show_above, selection_count ON record
+            WHEN old.origin = new.origin AND old.best_rank != new.best_rank BEGIN
+                {best_chain_sql("new.origin", "new.id", 0)}
+            END;
+
+            CREATE TRIGGER node_best_record_move AFTER UPDATE OF origin ON record
+            WHEN old.origin != new.origin BEGIN
+                {best_chain_sql("old.origin", "old.id", -1)}
+                {best_chain_sql("new.origin", "new.id", 1)}
+            END;
+            COMMIT;
+        """
+        )
+        self.fill_node_best()
+        self.conn.commit()
+
+    def fill_node_best(self, last_id=0):
+        """Rank node_best afresh for every node above the records after last_id, level by level from the bottom."""
+        cursor = self.cursor
+        cursor.execute("DROP TABLE IF EXISTS temp.new_origin")
+        cursor.execute(
+            "CREATE TEMP TABLE new_origin AS SELECT DISTINCT origin FROM record WHERE id > ?", (last_id,)
+        )
+        cursor.execute("CREATE TEMP TABLE new_node (node_key TEXT PRIMARY KEY)")
+        for length in range(len(TimeNode.LEVELS), -1, -1):
+            cursor.execute("DELETE FROM temp.new_node")
+            cursor.execute(
+                "INSERT INTO temp.new_node SELECT DISTINCT substr(origin, 1, ?) FROM new_origin WHERE length(origin) >= ?",
+                (length, length),
+            )
+            cursor.execute(
+                """
+                INSERT INTO node_best (node_key, own_count)
+                SELECT node_key, (SELECT count(*) FROM record WHERE origin = node_key) FROM temp.new_node
+                WHERE true
+                ON CONFLICT (node_key) DO UPDATE SET own_count = excluded.own_count
+            """
+            )
+            cursor.execute(
+                f"""
+                UPDATE node_best SET (record_id, score) = ({best_of_sql("node_best.node_key")})
+                WHERE node_key IN (SELECT node_key FROM temp.new_node)
+            """
+            )
+        cursor.execute("DROP TABLE temp.new_origin")
+        cursor.execute("DROP TABLE temp.new_node")
+
+    @classmethod
+    def open_reader(cls, path):
+        """Read-only store on path, upgrading the schema first if no writer has yet."""
+        store = cls(path, readonly=True)
+        if store.schema_is_current():
+            return store
+        store.close()
+        # The readers' queries need the derived tables: a writer creates them once
+        cls(path).close()
+        return cls(path, readonly=True)
+
+    def table_exists(self, name) -> bool:
+        self.cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,))
+        return self.cursor.fetchone() is not None
+
+    def create_search_index(self) -> bool:
+        """Create and fill the FTS5 index over record titles and bodies on first use.
+
+        Returns False when this SQLite build has no FTS5; search is then unavailable.
+        """
+        cursor = self.cursor
+        if self.table_exists("record_fts"):
+            return True
+
+        try:
+            cursor.executescript(
+                f"""
+                BEGIN;
+                CREATE VIRTUAL TABLE record_fts USING fts5(title, body);
+
+                CREATE TRIGGER record_fts_insert AFTER INSERT ON record BEGIN
+                    INSERT INTO record_fts (rowid, title, body)
+                    VALUES (new.id, {bracket_title_sql("new.text")}, {body_sql("new.text")});
+                END;
+
+                CREATE TRIGGER record_fts_delete AFTER DELETE ON record BEGIN
+                    DELETE FROM record_fts WHERE rowid = old.id;
+                END;
+
+                CREATE TRIGGER record_fts_update AFTER UPDATE OF text ON record BEGIN
+                    UPDATE record_fts
+                    SET title = {bracket_title_sql("new.text")}, body = {body_sql("new.text")}
+                    WHERE rowid = new.id;
+                END;
+
+                INSERT INTO record_fts (rowid, title, body)
+                SELECT id, {bracket_title_sql("text")}, {body_sql("text")} FROM record;
+                COMMIT;
+            """
+            )
+        except sqlite3.OperationalError:
+            self.conn.rollback()
+            return False
+        return True
+
+    def migrate(self):
+        cursor = self.cursor
+        cursor.execute("PRAGMA user_version")
+        version = cursor.fetchone()[0]
+
+        if version < 1:
+            # One-time move of the comma-joined selected_list strings into record_selection
+            cursor.execute(
+                "SELECT id, selected_list FROM record WHERE selected_list IS NOT NULL AND selected_list != ''"
+            )
+            cursor.executemany(
+                "INSERT OR IGNORE INTO record_selection (record_id, node_key) VALUES (?, ?)",
+                [
+                    (record_id, node_key)
+                    for record_id, selected_list in cursor.fetchall()
+                    for node_key in selected_list.split(",")
+                    if node_key
+                ],
+            )
+
+        if version < 2:
+            cursor.execute("SELECT 1 FROM pragma_table_info('record') WHERE name = 'title'")
+            if not cursor.fetchone():
+                cursor.execute("ALTER TABLE record ADD COLUMN title TEXT")
+            cursor.execute(f"UPDATE record SET title = {title_sql('text')} WHERE title IS NULL")
+
+        if version < 3:
+            cursor.execute("SELECT 1 FROM pragma_table_xinfo('record') WHERE name = 'selection_count'")
+            if not cursor.fetchone():
+                cursor.execute("ALTER TABLE record ADD COLUMN selection_count INTEGER NOT NULL DEFAULT 0")
+                cursor.execute(
+                    """
+                    ALTER TABLE record ADD COLUMN best_rank INTEGER
+                    GENERATED ALWAYS AS ((selection_count > 0) << 1 | show_above) VIRTUAL
+                """
+                )
+            # node_best of version 2 ranked every record of every ancestor on each write:
+            # create_node_best builds it again with the incremental triggers
+            for trigger in (
+                "node_best_record_insert",
+                "node_best_record_delete",
+                "node_best_record_update",
+                "node_best_record_move",
+                "node_best_selection_insert",
+                "node_best_selection_delete",
+            ):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+            cursor.execute("DROP TABLE IF EXISTS node_best")
+            cursor.execute(
+                """
+                UPDATE record SET selection_count = (
+                    SELECT count(*) FROM record_selection WHERE record_id = record.id
+                )
+                WHERE id IN (SELECT record_id FROM record_selection)
+            """
+            )
+
+        if version < SCHEMA_VERSION:
+            cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def written(self):
+        """Commit a mutation now, or leave it pending until flush() in write-behind mode."""
+        if not self.write_behind:
+            self.conn.commit()
+            self.skip_own_changes()
+        elif self.pending_since is None:
+            self.pending_since = time.monotonic()
+
+    def pending_seconds(self) -> float:
+        """How long the oldest uncommitted write has been waiting."""
+        return 0.0 if self.pending_since is None else time.monotonic() - self.pending_since
+
+    @property
+    def has_pending(self) -> bool:
+        return self.conn.in_transaction
+
+    def flush(self):
+        if self.conn.in_transaction:
+            self.conn.commit()
+            self.skip_own_changes()
+        self.pending_since = None
+
+    def close(self):
+        if not self.readonly:
+            atexit.unregister(self.flush)
+            self.flush()
+        self.conn.close()
+
+    def data_version(self) -> int:
+        """Changes whenever another connection commits to the database."""
+        self.cursor.execute("PRAGMA data_version")
+        return self.cursor.fetchone()[0]
+
+    def has_external_changes(self) -> bool:
+        """Whether another connection committed since the last poll_changes()."""
+        return self.data_version() != self.seen_data_version
+
+    def poll_changes(self) -> Optional[ChangeSet]:
+        """What other connections committed since the last poll, or None if nothing.
+
+        Costs a single PRAGMA data_version while nothing changed. Writes of this
+        connection committed alongside may come back too; the views apply
+        them idempotently. Records changed are dropped from the identity map.
+        """
+        version = self.data_version()
+        if version == self.seen_data_version:
+            return None
+        self.seen_data_version = version
+
+        self.cursor.execute(
+            "SELECT id, record_id, node_key, kind FROM change_log WHERE id > ? ORDER BY id",
+            (self.seen_change_id,),
+        )
+        rows = self.fetchall()
+        if not rows:
+            return None
+        everything = rows[0][0] > self.seen_change_id + 1
+        self.seen_change_id = rows[-1][0]
+
+        origins, selection_keys, record_ids, selected_ids = set(), set(), set(), set()
+        for _, record_id, node_key, kind in rows:
+            if kind == "all":
+                everything = True
+            elif kind == "record":
+                origins.add(node_key)
+            else:
+                selection_keys.add(node_key)
+                selected_ids.add(record_id)
+            if record_id is not None:
+                record_ids.add(record_id)
+
+        if selected_ids and not everything:
+            # A selection can change the best memory above the record's own origin
+            selected_ids = list(selected_ids)
+            self.cursor.execute(
+                f"SELECT DISTINCT origin FROM record WHERE id IN ({', '.join('?' * len(selected_ids))})",
+                selected_ids,
+            )
+            origins.update(origin for (origin,) in self.fetchall())
+
+        if everything:
+            self.records.clear()
+        else:
+            for record_id in record_ids:
+                self.records.pop(record_id, None)
+        return ChangeSet(frozenset(origins), frozenset(selection_keys), frozenset(record_ids), everything)
+
+    def skip_own_changes(self):
+        """After a commit: unless another connection committed meanwhile, the whole log is ours."""
+        if self.data_version() == self.seen_data_version:
+            self.cursor.execute("SELECT coalesce(max(id), 0) FROM change_log")
+            self.seen_change_id = self.cursor.fetchone()[0]
+
+    def fetchall(self):
+        """Rows of the last query on self.cursor, counted by the profiler."""
+        rows = self.cursor.fetchall()
+        profiler.add_rows(len(rows))
+        return rows
+
+    # Identity map
+
+    def record_from_row(self, row) -> Record:
+        """Record for row, reusing the one already loaded while it is unchanged."""
+        record = self.records.get(row[RAW_QUERY_ID])
+        if record is not None and record.matches(row):
+            if record._text is None and row[RAW_QUERY_TEXT] is not None:
+                object.__setattr__(record, "_text", row[RAW_QUERY_TEXT])
+            return record
+        record = Record.from_row(row, self)
+        self.records[record.id] = record
+        return record
+
+    def adopt(self, record: Record) -> Record:
+        """This store's Record for one loaded through another connection."""
+        return self.record_from_row(
+            (record.id, record.origin, record._text, record.show_above, record.show_below, record.title)
+        )
+
+    # Change notifications
+
+    def add_listener(self, callback):
+        """Call callback(change) with a RecordChange after every record write."""
+        self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        self.listeners.remove(callback)
+
+    def notify(self, kind, record_id, origin=None, node_keys=(), **details):
+        if not self.listeners:
+            return
+        record = self.get_record(record_id)
+        node_keys = set(node_keys)
+        if record is not None and kind in ROLLUP_KINDS:
+            node_keys.update(TimeNode(record.origin).ancestor_keys())
+        change = RecordChange(
+            kind=kind,
+            record_id=record_id,
+            origin=origin if record is None else record.origin,
+            record=record,
+            node_keys=frozenset(node_keys),
+            **details,
+        )
+        for listener in list(self.listeners):
+            listener(change)
+
+    # Bulk writes
+
+    @contextmanager
+    def bulk_insert(self):
+        """One transaction for inserting many records through the yielded cursor.
+
+        The triggers on record are dropped meanwhile, so each row costs one
+        insert instead of a dozen trigger statements. On exit node_stats and
+        record_fts catch up with every new row in one grouped pass and the
+        triggers come back, all before the commit. Listeners are not notified.
+        """
+        self.flush()
+        cursor = self.cursor
+        cursor.execute("SELECT coalesce(max(id), 0) FROM record")
+        last_id = cursor.fetchone()[0]
+        cursor.execute("SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND tbl_name = 'record'")
+        triggers = cursor.fetchall()
+        cursor.execute("PRAGMA cache_size")
+        cache_size = cursor.fetchone()[0]
+        cursor.execute(f"PRAGMA cache_size = {-BULK_CACHE_KIB}")
+
+        cursor.execute("BEGIN")
+        try:
+            for name, _ in triggers:
+                cursor.execute(f"DROP TRIGGER {name}")
+            yield cursor
+            self.catch_up(last_id)
+            for _, sql in triggers:
+                cursor.execute(sql)
+        except BaseException:
+            self.conn.rollback()
+            raise
+        else:
+            self.conn.commit()
+            self.skip_own_changes()
+        finally:
+            cursor.execute(f"PRAGMA cache_size = {cache_size}")
+
+    def catch_up(self, last_id):
+        """Bring the tables derived from record up to date with the records after last_id."""
+        cursor = self.cursor
+        cursor.execute(
+            f"UPDATE record SET title = {title_sql('text')} WHERE id > ? AND title IS NULL",
+            (last_id,),
+        )
+        # Grouping by origin first leaves one row per distinct origin to spread over its prefixes
+        cursor.execute(
+            """
+            WITH per_origin AS (
+                SELECT origin, count(*) AS records, sum(show_above OR show_below) AS flagged
+                FROM record WHERE id > ?
+                GROUP BY origin
+            )
+            INSERT INTO node_stats (node_key, record_count, flagged_count)
+            SELECT substr(origin, 1, length), sum(records), sum(flagged)
+            FROM per_origin JOIN key_prefix ON length <= length(origin)
+            WHERE true
+            GROUP BY 1
+            ON CONFLICT (node_key) DO UPDATE SET
+                record_count = record_count + excluded.record_count,
+                flagged_count = flagged_count + excluded.flagged_count
+        """,
+            (last_id,),
+        )
+        self.fill_node_best(last_id)
+        # Too many rows to list one by one: other connections reload everything
+        cursor.execute("INSERT INTO change_log (node_key, kind) VALUES ('', 'all')")
+        if self.has_search:
+            cursor.execute(
+                f"""
+                INSERT INTO record_fts (rowid, title, body)
+                SELECT id, {bracket_title_sql("text")}, {body_sql("text")} FROM record WHERE id > ?
+            """,
+                (last_id,),
+            )
+
+    # User
+
+    def get_birthdate(self) -> Optional[datetime]:
+        self.cursor.execute("SELECT birthdate FROM user LIMIT 1")
+        result = self.cursor.fetchone()
+        return datetime.strptime(result[0], "%Y-%m-%d") if result else None
+
+    def set_birthdate(self, birthdate: str) -> datetime:
+        """Store birthdate given as YYYY-MM-DD; raises ValueError on other formats."""
+        parsed = datetime.strptime(birthdate, "%Y-%m-%d")
+        self.cursor.execute("INSERT INTO user (birthdate) VALUES (?)", (birthdate,))
+        self.conn.commit()
+        return parsed
+
+    # Records
+
+    def records_query(
+        self,
+        origin=None,
+        selected_list=None,
+        show_below_parent=None,
+        show_above_child=None,
+    ):
+        """SQL and parameters behind get_records, or (None, None) when nothing is asked."""
+        queries = []
+        params = []
+
+        if origin:
+            queries.append("origin = ?")
+            params.append(origin)
+
+        if selected_list:
+            queries.append(
+                "id IN (SELECT record_id FROM record_selection WHERE node_key = ?)"
+            )
+            params.append(selected_list)
+
+        if show_below_parent:
+            # ABCDF -> ABCDF, ABCD, ABC, AB, A
+            ancestors = [show_below_parent[:length] for length in range(len(show_below_parent), 0, -1)]
+            queries.append(f"show_below = 1 AND origin IN ({', '.join('?' * len(ancestors))})")
+            params.extend(ancestors)
+
+        if show_above_child:
+            # ABCDF -> every origin starting with ABCDF, i.e. ABCDF <= origin < ABCDG
+            low, high = TimeNode(show_above_child).descendant_range()
+            queries.append("show_above = 1 AND origin >= ? AND origin < ?")
+            params.extend([low, high])
+
+        if not queries:
+            return None, None
+
+        where_clause = " AND ".join(f"({query})" for query in queries)
+        return f"SELECT {SUMMARY_COLUMNS} FROM record WHERE {where_clause}", params
+
+    def get_records(self, **filters) -> List[Record]:
+        """Records matching every filter given; see records_query for the filters."""
+        sql, params = self.records_query(**filters)
+        if not sql:
+            return []
+
+        self.cursor.execute(sql, params)
+        return [self.record_from_row(row) for row in self.fetchall()]
+
+    def explain_records_query(self, **filters) -> List[str]:
+        """EXPLAIN QUERY PLAN details of the get_records query for filters."""
+        sql, params = self.records_query(**filters)
+        self.cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+        return [row[-1] for row in self.fetchall()]
+
+    def get_record(self, record_id: int) -> Optional[Record]:
+        """Record without its text, see get_text."""
+        self.cursor.execute(f"SELECT {SUMMARY_COLUMNS} FROM record WHERE id = ?", (record_id,))
+        row = self.cursor.fetchone()
+        return self.record_from_row(row) if row else None
+
+    def get_text(self, record_id: int) -> Optional[str]:
+        self.cursor.execute("SELECT text FROM record WHERE id = ?", (record_id,))
+        row = self.cursor.fetchone()
+        return row[0] if row else None
+
+    def selection_keys(self, record_id: int) -> List[str]:
+        """Nodes record_id is selected for."""
+        self.cursor.execute("SELECT node_key FROM record_selection WHERE record_id = ?", (record_id,))
+        return [row[0] for row in self.fetchall()]
+
+    def iter_subtree(self, key: str, batch_size=1000) -> Iterator[Tuple[Record, List[str]]]:
+        """Yield (record, nodes it is selected for) for every record in the subtree of key.
+
+        Rows come in origin order straight off the UNIQUE(origin, text) index
+        and are fetched batch_size at a time, so memory use stays flat.
+        """
+        low, high = TimeNode(key).descendant_range()
+        queries = ["record.origin >= ?"]
+        params = [low]
+        if high:
+            queries.append("record.origin < ?")
+            params.append(high)
+
+        cursor = self.conn.cursor()
+        cursor.execute(
+            f"""
+            SELECT {RECORD_COLUMNS},
+                (SELECT group_concat(node_key, ',') FROM record_selection WHERE record_id = record.id)
+            FROM record
+            WHERE {" AND ".join(queries)}
+            ORDER BY record.origin, record.text
+        """,
+            params,
+        )
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield Record.from_row(row), row[-1].split(",") if row[-1] else []
+        finally:
+            cursor.close()
+
+    def fetch_selected_for_record(self, node_key: str) -> List[Record]:
+        self.cursor.execute(
+            f"""
+            SELECT {SUMMARY_COLUMNS}
+            FROM record_selection
+            JOIN record ON record.id = record_selection.record_id
+            WHERE record_selection.node_key = ?
+            ORDER BY record.id
+        """,
+            (node_key,),
+        )
+        return [self.record_from_row(row) for row in self.fetchall()]
+
+    def fetch_selected_titles(self, parent_key: str, depth=2) -> Dict[str, List[str]]:
+        """Titles of records selected for each descendant of parent_key, down to depth levels."""
+        parent = TimeNode(parent_key)
+        low, high = parent.descendant_range()
+        queries = ["record_selection.node_key > ?", "length(record_selection.node_key) <= ?"]
+        params = [low, parent.level + depth]
+        if high:
+            queries.append("record_selection.node_key < ?")
+            params.append(high)
+
+        self.cursor.execute(
+            f"""
+            SELECT record_selection.node_key, record.title
+            FROM record_selection
+            JOIN record ON record.id = record_selection.record_id
+            WHERE {" AND ".join(queries)}
+            ORDER BY record_selection.node_key, record.id
+        """,
+            params,
+        )
+
+        selected_titles = {}
+        for node_key, title in self.fetchall():
+            selected_titles.setdefault(node_key, []).append(title)
+        return selected_titles
+
+    def fetch_titles_selected_for(self, node_keys: Iterable[str]) -> Dict[str, List[str]]:
+        """Titles of records selected for each of node_keys that has any."""
+        node_keys = list(node_keys)
+        if not node_keys:
+            return {}
+
+        self.cursor.execute(
+            f"""
+            SELECT record_selection.node_key, record.title
+            FROM record_selection
+            JOIN record ON record.id = record_selection.record_id
+            WHERE record_selection.node_key IN ({", ".join("?" * len(node_keys))})
+            ORDER BY record_selection.node_key, record.id
+        """,
+            node_keys,
+        )
+
+        selected_titles = {}
+        for node_key, title in self.fetchall():
+            selected_titles.setdefault(node_key, []).append(title)
+        return selected_titles
+
+    def fetch_record_list(self, name: str, parent_key: str, child_key: str) -> List[Record]:
+        """Records of one of RECORD_LISTS while child_key is selected under parent_key."""
+        with profiler.phase(f"query {name}"):
+            return self.query_record_list(name, parent_key, child_key)
+
+    def query_record_list(self, name: str, parent_key: str, child_key: str) -> List[Record]:
+        if name == "Selected":
+            return self.get_records(selected_list=child_key)
+        if name == "Self":
+            return self.get_records(origin=child_key)
+        if name == "High TF":
+            records = self.get_records(show_below_parent=parent_key)
+        elif name == "Low TF":
+            records = self.get_records(show_above_child=child_key)
+        else:
+            raise ValueError(f"Unknown record list {name!r}")
+        return [record for record in records if record.origin != child_key]
+
+    def fetch_record_lists(self, parent_key: str, child_key: str) -> Dict[str, List[Record]]:
+        return {name: self.fetch_record_list(name, parent_key, child_key) for name in RECORD_LISTS}
+
+    def fetch_grid_summary(self, parent_key: str) -> GridSummary:
+        node_keys = TimeNode(parent_key).descendant_keys(2)
+        return GridSummary(
+            selected_titles=self.fetch_selected_titles(parent_key),
+            node_stats=self.fetch_node_stats(node_keys),
+            best_titles=self.fetch_best_titles(node_keys),
+        )
+
+    def fetch_best_titles(self, node_keys: Iterable[str]) -> Dict[str, str]:
+        """Title of the best memory of each of node_keys that has any records."""
+        node_keys = list(node_keys)
+        if not node_keys:
+            return {}
+
+        self.cursor.execute(
+            f"""
+            SELECT node_best.node_key, record.title
+            FROM node_best
+            JOIN record ON record.id = node_best.record_id
+            WHERE node_best.node_key IN ({", ".join("?" * len(node_keys))})
+        """,
+            node_keys,
+        )
+        return dict(self.fetchall())
+
+    def fetch_node_stats(self, node_keys: Iterable[str]) -> Dict[str, NodeStats]:
+        """Counts for each of node_keys that has any; missing keys have none."""
+        node_keys = list(node_keys)
+        if not node_keys:
+            return {}
+
+        self.cursor.execute(
+            f"""
+            SELECT node_key, record_count, selected_count, flagged_count
+            FROM node_stats
+            WHERE node_key IN ({", ".join("?" * len(node_keys))})
+        """,
+            node_keys,
+        )
+        return {row[0]: NodeStats(*row[1:]) for row in self.fetchall()}
+
+    def search(self, text: str, limit=50) -> List[Record]:
+        """Records matching every word of text, best matches first; titles weigh most."""
+        query = fts_query(text)
+        if not query or not self.has_search:
+            return []
+
+        self.cursor.execute(
+            f"""
+            SELECT {SUMMARY_COLUMNS}
+            FROM record_fts
+            JOIN record ON record.id = record_fts.rowid
+            WHERE record_fts MATCH ?
+            ORDER BY bm25(record_fts, 10.0, 1.0)
+            LIMIT ?
+        """,
+            (query, limit),
+        )
+        return [self.record_from_row(row) for row in self.fetchall()]
+
+    def create_record(self, origin: str, text: str) -> int:
+        self.cursor.execute(
+            "INSERT INTO record (origin, text) VALUES (?, ?)",
+            (origin, text),
+        )
+        record_id = self.cursor.lastrowid
+        self.written()
+        self.notify("created", record_id, node_keys=TimeNode(origin).ancestor_keys())
+        return record_id
+
+    def update_text(self, record_id: int, text: str):
+        self.cursor.execute(
+            "UPDATE record SET text = ? WHERE id = ?",
+            (text, record_id),
+        )
+        self.records.pop(record_id, None)
+        self.written()
+        if self.listeners:
+            self.notify("text", record_id, node_keys=self.selection_keys(record_id))
+
+    def delete_record(self, record_id: int):
+        record = self.get_record(record_id) if self.listeners else None
+        node_keys = self.selection_keys(record_id) if record else []
+        self.cursor.execute("DELETE FROM record WHERE id = ?", (record_id,))
+        self.records.pop(record_id, None)
+        self.written()
+        if record:
+            node_keys += TimeNode(record.origin).ancestor_keys()
+            self.notify("deleted", record_id, origin=record.origin, node_keys=node_keys)
+
+    def set_show_above(self, record_id: int, is_checked: bool):
+        self.cursor.execute(
+            "UPDATE record SET show_above = ? WHERE id = ?",
+            (is_checked, record_id),
+        )
+        self.written()
+        self.notify("show_above", record_id)
+
+    def set_show_below(self, record_id: int, is_checked: bool):
+        self.cursor.execute(
+            "UPDATE record SET show_below = ? WHERE id = ?",
+            (is_checked, record_id),
+        )
+        self.written()
+        self.notify("show_below", record_id)
+
+    # Selections
+
+    def toggle_selection(self, record_id: int, node_key: str) -> bool:
+        """Select record_id for node_key, or detach it if already selected.
+
+        Returns whether the record is selected afterwards.
+        """
+        self.cursor.execute(
+            "SELECT 1 FROM record_selection WHERE record_id = ? AND node_key = ?",
+            (record_id, node_key),
+        )
+
+        if self.cursor.fetchone():
+            self.cursor.execute(
+                "DELETE FROM record_selection WHERE record_id = ? AND node_key = ?",
+                (record_id, node_key),
+            )
+            selected = False
+        else:
+            self.cursor.execute(
+                "INSERT INTO record_selection (record_id, node_key) VALUES (?, ?)",
+                (record_id, node_key),
+            )
+            selected = True
+
+        self.written()
+        self.notify(
+            "selection",
+            record_id,
+            node_keys=[node_key],
+            selection_key=node_key,
+            selected=selected,
+        )
+        return selected
@@ -0,0 +1,187 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from memory_store import MemoryStore
+
+# Grid summaries and record lists kept around for adjacent nodes
+CACHE_SIZE = 64
+PREFETCH_THREADS = 2
+# Searches are queued ahead of prefetches: someone is waiting for them
+SEARCH_PRIORITY = 1
+
+logger = logging.getLogger(__name__)
+
+
+def grid_entry(parent_key):
+    return ("grid", parent_key)
+
+
+def lists_entry(parent_key, child_key):
+    return ("lists", parent_key, child_key)
+
+
+def search_entry(text):
+    return ("search", text)
+
+
+class PrefetchSignals(QObject):
+    # generation, cache entry, loaded value
+    loaded = pyqtSignal(int, object, object)
+    # search text, hits
+    searched = pyqtSignal(str, object)
+
+
+class PrefetchTask(QRunnable):
+    def __init__(self, prefetcher, generation, entry):
+        super().__init__()
+        self.prefetcher = prefetcher
+        self.generation = generation
+        self.entry = entry
+
+    def run(self):
+        try:
+            value = self.prefetcher.load(self.prefetcher.reader(), self.entry)
+        except Exception:
+            logger.warning("Prefetch of %s failed", self.entry, exc_info=True)
+            value = None
+        self.prefetcher.signals.loaded.emit(self.generation, self.entry, value)
+
+
+class Prefetcher:
+    """Loads the views next to the shown node on worker threads into a bounded LRU cache.
+
+    Each worker thread reads through its own read-only connection, opened
+    on its first task and kept for the next ones. Records loaded there are
+    adopted into the main store's identity map on arrival. Workers only see
+    committed data: nothing is prefetched while the main store holds pending
+    writes, and every write drops the cache along with results still in flight.
+    Commits from other processes bypass the cache until the app polls them.
+
+    Searches run on the same workers, never cached. Only the hits of the
+    latest search text are handed on through signals.searched.
+    """
+
+    def __init__(self, store, max_entries=CACHE_SIZE, max_threads=PREFETCH_THREADS):
+        self.store = store
+        self.max_entries = max_entries
+        self.cache = OrderedDict()
+        self.in_flight = set()
+        self.generation = 0
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(max_threads)
+        # Workers never expire, so their connections last as long as the pool
+        self.pool.setExpiryTimeout(-1)
+        self.signals = PrefetchSignals()
+        self.signals.loaded.connect(self.on_loaded)
+        self.enabled = store.path != ":memory:"
+        self.search_text = None
+        self.search_task = None
+        # Read-only store of each worker thread by thread id. Not threading.local:
+        # Python forgets the locals of Qt's threads between tasks
+        self.readers = {}
+
+    def reader(self):
+        """Read-only store of the calling worker thread."""
+        thread = threading.get_ident()
+        store = self.readers.get(thread)
+        if store is None:
+            store = self.readers[thread] = MemoryStore.open_reader(self.store.path)
+        return store
+
+    @staticmethod
+    def load(store, entry):
+        if entry[0] == "grid":
+            return store.fetch_grid_summary(entry[1])
+        if entry[0] == "search":
+            return store.search(entry[1])
+        return store.fetch_record_lists(entry[1], entry[2])
+
+    def get(self, entry):
+        """Cached value for entry, loading it on the calling thread on a miss.
+
+        The cache is bypassed while other connections have commits the app
+        has not polled yet; polling them invalidates it.
+        """
+        fresh = not self.store.has_external_changes()
+        if fresh and entry in self.cache:
+            self.cache.move_to_end(entry)
+            return self.cache[entry]
+        value = self.load(self.store, entry)
+        if fresh and not self.store.has_pending:
+            self.put(entry, value)
+        return value
+
+    def put(self, entry, value):
+        self.cache[entry] = value
+        self.cache.move_to_end(entry)
+        while len(self.cache) > self.max_entries:
+            self.cache.popitem(last=False)
+
+    def invalidate(self):
+        self.generation += 1
+        self.cache.clear()
+        self.in_flight.clear()
+
+    def prefetch(self, entries):
+        if not self.enabled or self.store.has_pending:
+            return
+        for entry in entries:
+            if entry in self.cache or entry in self.in_flight:
+                continue
+            self.in_flight.add(entry)
+            self.pool.start(PrefetchTask(self, self.generation, entry))
+
+    def search(self, text):
+        """Search text on a worker; workers only see committed data, so flush first."""
+        self.search_text = text
+        if self.search_task is not None:
+            # Still queued behind other tasks: its text is stale already
+            self.pool.tryTake(self.search_task)
+            self.search_task = None
+        if not self.enabled:
+            self.signals.searched.emit(text, self.store.search(text))
+            return
+        self.search_task = PrefetchTask(self, self.generation, search_entry(text))
+        self.search_task.setAutoDelete(False)
+        self.pool.start(self.search_task, SEARCH_PRIORITY)
+
+    def prefetch_around(self, parent, selected_child, is_valid):
+        """Queue the views reachable in one step from parent with selected_child shown."""
+        entries = []
+        if selected_child:
+            entries.append(grid_entry(selected_child))
+        if parent.level > 0:
+            entries.append(grid_entry(parent.key[:-1]))
+        for letter in parent.get_child_letters():
+            child_key = parent.key + letter
+            if child_key != selected_child and is_valid(child_key):
+                entries.append(lists_entry(parent.key, child_key))
+        self.prefetch(entries)
+
+    def on_loaded(self, generation, entry, value):
+        if entry[0] == "search":
+            if entry[1] == self.search_text:
+                self.search_task = None
+                hits = [self.store.adopt(record) for record in value or []]
+                self.signals.searched.emit(entry[1], hits)
+            return
+        if generation != self.generation:
+            return
+        self.in_flight.discard(entry)
+        if value is None:
+            return
+        if entry[0] == "lists":
+            # Rebind the worker's records to the main store, sharing those already loaded
+            value = {name: [self.store.adopt(record) for record in records] for name, records in value.items()}
+        self.put(entry, value)
+
+    def shutdown(self):
+        self.invalidate()
+        self.search_text = None
+        self.pool.clear()
+        self.pool.waitForDone()
+        # Idle workers are no longer using them; garbage collection closes them
+        self.readers.clear()
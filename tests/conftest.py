@@ -0,0 +1,73 @@
+import os
+import random
+import sys
+
+import pytest
+
+# The modules live at the top of the repository, next to memories.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from memory_store import MemoryStore  # noqa: E402
+
+# Few letters per level, so records pile up on shared origins and ancestors
+KEY_ALPHABET = "ABC"
+
+
+def random_key(rng, max_depth=6):
+    return "".join(rng.choice(KEY_ALPHABET) for _ in range(rng.randint(1, max_depth)))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MemoryStore(str(tmp_path / "memory_map.db"))
+    store.set_birthdate("1990-05-12")
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def mutate():
+    """mutate(store, count, seed): that many random creates, edits, flag changes,
+    selection toggles and deletes through the store API."""
+
+    def run(store, count, seed=0):
+        rng = random.Random(seed)
+        store.cursor.execute("SELECT id FROM record")
+        ids = [record_id for (record_id,) in store.cursor.fetchall()]
+        for step in range(count):
+            roll = rng.random()
+            if roll < 0.4 or not ids:
+                ids.append(store.create_record(random_key(rng), f"[t{step}]body {step}"))
+            elif roll < 0.5:
+                store.update_text(rng.choice(ids), f"[e{step}]edited {step}")
+            elif roll < 0.6:
+                store.set_show_above(rng.choice(ids), rng.random() < 0.5)
+            elif roll < 0.7:
+                store.set_show_below(rng.choice(ids), rng.random() < 0.5)
+            elif roll < 0.85:
+                store.toggle_selection(rng.choice(ids), random_key(rng, 3))
+            else:
+                record_id = rng.choice(ids)
+                ids.remove(record_id)
+                store.delete_record(record_id)
+
+    return run
+
+
+@pytest.fixture
+def bulk_insert():
+    """bulk_insert(store, count, seed): random records through MemoryStore.bulk_insert."""
+
+    def run(store, count, seed=0):
+        rng = random.Random(seed)
+        rows = [
+            (random_key(rng), f"[b{seed}-{step}]bulk", rng.random() < 0.1, rng.random() < 0.1)
+            for step in range(count)
+        ]
+        with store.bulk_insert() as cursor:
+            cursor.executemany(
+                "INSERT OR IGNORE INTO record (origin, text, show_above, show_below) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+
+    return run
@@ -0,0 +1,111 @@
+"""Tables derived from record by triggers and by bulk_insert's catch_up, against the same
+figures worked out from scratch in Python."""
+from collections import Counter
+
+import pytest
+
+from timenode import TimeNode
+
+
+def node_stats_from_scratch(store):
+    records, flagged, selected = Counter(), Counter(), Counter()
+    store.cursor.execute("SELECT origin, show_above OR show_below FROM record")
+    for origin, is_flagged in store.cursor.fetchall():
+        for key in TimeNode(origin).ancestor_keys():
+            records[key] += 1
+            flagged[key] += is_flagged
+    store.cursor.execute("SELECT node_key FROM record_selection")
+    for (node_key,) in store.cursor.fetchall():
+        for key in TimeNode(node_key).ancestor_keys():
+            selected[key] += 1
+    return {key: (records[key], selected[key], flagged[key]) for key in records.keys() | selected.keys()}
+
+
+def node_best_from_scratch(store):
+    """Best (record_id, score) among every record below each node, and its own record count."""
+    store.cursor.execute("SELECT DISTINCT record_id FROM record_selection")
+    selected = {record_id for (record_id,) in store.cursor.fetchall()}
+    store.cursor.execute("SELECT id, origin, show_above FROM record")
+    records = store.cursor.fetchall()
+    density = Counter(origin for _, origin, _ in records)
+
+    best = {}
+    for record_id, origin, show_above in records:
+        score = ((record_id in selected) << 1 | show_above) << 32 | density[origin]
+        for key in TimeNode(origin).ancestor_keys():
+            current = best.get(key)
+            # Highest score wins, the lowest id breaks ties
+            if current is None or (score, -record_id) > (current[1], -current[0]):
+                best[key] = (record_id, score)
+    return {key: (record_id, score, density[key]) for key, (record_id, score) in best.items()}
+
+
+DERIVED_TABLES = {
+    "node_stats": (
+        "SELECT node_key, record_count, selected_count, flagged_count FROM node_stats",
+        node_stats_from_scratch,
+    ),
+    "node_best": ("SELECT node_key, record_id, score, own_count FROM node_best", node_best_from_scratch),
+}
+
+
+@pytest.fixture(params=list(DERIVED_TABLES))
+def check(request):
+    """check(store): the derived table equals its recomputation from scratch."""
+    sql, from_scratch = DERIVED_TABLES[request.param]
+
+    def run(store):
+        store.cursor.execute(sql)
+        assert {key: tuple(values) for key, *values in store.cursor.fetchall()} == from_scratch(store)
+
+    return run
+
+
+def test_triggers(store, mutate, check):
+    mutate(store, 1500)
+    check(store)
+
+
+def test_bulk_insert(store, mutate, bulk_insert, check):
+    mutate(store, 300)
+    bulk_insert(store, 1000, seed=1)
+    check(store)
+    # Triggers are back after the bulk insert
+    mutate(store, 300, seed=2)
+    check(store)
+
+
+def test_moving_records(store, mutate, check):
+    mutate(store, 300)
+    store.cursor.execute("UPDATE record SET origin = substr(origin, 1, 2) || 'A' WHERE id % 3 = 0")
+    check(store)
+
+
+def test_fetch_node_stats(store):
+    record_id = store.create_record("CDA", "[a]one")
+    store.create_record("CDB", "[b]two")
+    store.set_show_above(record_id, True)
+    store.toggle_selection(record_id, "C")
+    stats = store.fetch_node_stats(["", "C", "CD", "CDA", "CDB", "CE"])
+    assert stats["CD"].record_count == 2
+    assert stats["CD"].flagged_count == 1
+    assert stats["C"].selected_count == 1
+    assert "CE" not in stats
+
+
+def test_best_titles_rank_selection_then_show_above_then_density(store):
+    store.create_record("CDAB", "[crowded]")
+    store.create_record("CDAB", "[crowded too]")
+    flagged = store.create_record("CDAC", "[flagged]")
+    chosen = store.create_record("CDB", "[chosen]")
+    assert store.fetch_best_titles(["CD"]) == {"CD": "crowded"}
+
+    store.set_show_above(flagged, True)
+    assert store.fetch_best_titles(["CD"]) == {"CD": "flagged"}
+
+    store.toggle_selection(chosen, "C")
+    assert store.fetch_best_titles(["", "CD", "CDA"]) == {"": "chosen", "CD": "chosen", "CDA": "flagged"}
+
+    store.toggle_selection(chosen, "C")
+    store.delete_record(flagged)
+    assert store.fetch_best_titles(["CD", "CDB", "CDAC"]) == {"CD": "crowded", "CDB": "chosen"}
@@ -0,0 +1,59 @@
+"""Readers opened on a database from before the derived tables existed."""
+import sqlite3
+
+import pytest
+
+from memory_store import MemoryStore
+
+# Schema of the first release: no record_selection, title, node_stats or indexes
+BASELINE_SCHEMA = """
+    CREATE TABLE user (
+        id INTEGER PRIMARY KEY,
+        birthdate TEXT NOT NULL
+    );
+    CREATE TABLE record (
+        id INTEGER PRIMARY KEY,
+        origin TEXT NOT NULL,
+        text TEXT NOT NULL,
+        show_above BOOLEAN NOT NULL DEFAULT 0,
+        show_below BOOLEAN NOT NULL DEFAULT 0,
+        selected_list TEXT,
+        UNIQUE(origin, text)
+    );
+    INSERT INTO user (birthdate) VALUES ('1990-05-12');
+    INSERT INTO record (origin, text, show_above, selected_list) VALUES
+        ('CDAB', '[Lighthouse]walked there', 1, 'CD'),
+        ('CDAC', 'no title', 0, NULL);
+"""
+
+
+@pytest.fixture
+def baseline_path(tmp_path):
+    path = str(tmp_path / "memory_map.db")
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.close()
+    return path
+
+
+def test_reader_upgrades_baseline_database(baseline_path):
+    store = MemoryStore.open_reader(baseline_path)
+    try:
+        assert store.readonly
+        assert store.schema_is_current()
+        assert store.fetch_node_stats(["CD"])["CD"].record_count == 2
+        assert [record.title for record in store.fetch_record_list("Self", "CDA", "CDAB")] == ["Lighthouse"]
+        assert [record.title for record in store.fetch_selected_for_record("CD")] == ["Lighthouse"]
+        assert [record.origin for record, _ in store.iter_subtree("")] == ["CDAB", "CDAC"]
+    finally:
+        store.close()
+
+
+def test_reader_on_current_database_stays_read_only(store):
+    store.create_record("CDAB", "[a]b")
+    reader = MemoryStore.open_reader(store.path)
+    try:
+        with pytest.raises(sqlite3.OperationalError):
+            reader.cursor.execute("DELETE FROM record")
+    finally:
+        reader.close()
@@ -0,0 +1,35 @@
+"""The record list queries search an index instead of scanning the record table."""
+import pytest
+
+ORIGIN = "CDAB"
+
+
+@pytest.fixture(params=[0, 2000], ids=["empty", "filled"])
+def planned_store(request, store, bulk_insert):
+    if request.param:
+        bulk_insert(store, request.param)
+        store.cursor.execute("ANALYZE")
+    return store
+
+
+def assert_searches(details, index):
+    assert any(detail.startswith(f"SEARCH record USING INDEX {index}") for detail in details), details
+    assert not any(detail.startswith("SCAN record") for detail in details), details
+
+
+def test_high_tf_uses_show_below_index(planned_store):
+    details = planned_store.explain_records_query(show_below_parent=ORIGIN)
+    assert_searches(details, "idx_record_show_below")
+
+
+def test_low_tf_uses_show_above_index(planned_store):
+    details = planned_store.explain_records_query(show_above_child=ORIGIN[:2])
+    assert_searches(details, "idx_record_show_above")
+
+
+@pytest.mark.parametrize(
+    "filters", [{"origin": ORIGIN}, {"selected_list": ORIGIN[:2]}], ids=["Self", "Selected"]
+)
+def test_other_lists_do_not_scan(planned_store, filters):
+    details = planned_store.explain_records_query(**filters)
+    assert not any(detail.startswith("SCAN record") for detail in details), details
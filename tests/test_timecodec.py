@@ -0,0 +1,72 @@
+"""timecodec against TimeNode and timeframe_label, one key or moment at a time."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import timecodec  # noqa: E402
+from timenode import KEY_LETTERS, TimeNode, ValidityWindow, timeframe_label  # noqa: E402
+
+BIRTH_YEAR = 1990
+
+
+def random_moments(count, seed=16):
+    rng = random.Random(seed)
+    # From a little before birth_year to past the last decade, where key_for clamps
+    first = datetime(BIRTH_YEAR - 2, 1, 1)
+    hours = (95 * 366) * 24
+    return [first + timedelta(hours=rng.randrange(hours), minutes=rng.randrange(60)) for _ in range(count)]
+
+
+def random_keys(count, seed=16):
+    rng = random.Random(seed)
+    keys = []
+    for _ in range(count):
+        key = ""
+        for _, children, _, _ in TimeNode.LEVELS[: rng.randint(0, len(TimeNode.LEVELS))]:
+            key += KEY_LETTERS[rng.randrange(children)]
+        keys.append(key)
+    return keys
+
+
+def as_datetimes(values):
+    return [value.astype(datetime) for value in values]
+
+
+@pytest.mark.parametrize("depth", [1, 4, len(TimeNode.LEVELS)])
+def test_keys_for_matches_key_for(depth):
+    moments = random_moments(20000)
+    keys = timecodec.keys_for(np.array(moments, dtype="datetime64[s]"), BIRTH_YEAR, depth)
+    assert list(keys) == [TimeNode.key_for(moment, BIRTH_YEAR, depth) for moment in moments]
+
+
+def test_intervals_match_interval():
+    keys = random_keys(20000)
+    starts, ends = timecodec.intervals(keys, BIRTH_YEAR)
+    expected = [TimeNode.interval(key, BIRTH_YEAR) for key in keys]
+    assert list(zip(as_datetimes(starts), as_datetimes(ends))) == expected
+
+
+def test_timeframe_labels_match():
+    keys = random_keys(5000)
+    labels = timecodec.timeframe_labels(keys, BIRTH_YEAR)
+    assert list(labels) == [timeframe_label(key, BIRTH_YEAR) for key in keys]
+
+
+def test_valid_mask_matches_validity_window():
+    birthdate, now = datetime(1990, 5, 12, 7), datetime(2024, 2, 29, 13)
+    window = ValidityWindow(birthdate, BIRTH_YEAR)
+    window.now, window.now_key = now, TimeNode.key_for(now, BIRTH_YEAR)
+    keys = random_keys(20000)
+    mask = timecodec.valid_mask(keys, np.datetime64(birthdate, "s"), np.datetime64(now, "s"), BIRTH_YEAR)
+    assert list(mask) == [window.is_valid(key) for key in keys]
+
+
+@pytest.mark.parametrize("key", ["K", "AK", "ABCDEFGHI", "a", "AZ"])
+def test_rejects_invalid_keys(key):
+    with pytest.raises(ValueError):
+        TimeNode.interval(key, BIRTH_YEAR)
+    with pytest.raises(ValueError):
+        timecodec.intervals([key], BIRTH_YEAR)
@@ -0,0 +1,87 @@
+"""ValidityWindow against the plain definition: birthdate <= interval(key).start <= now."""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from timenode import TimeNode, ValidityWindow
+
+BIRTH_YEAR = 1990
+
+# Moments on and next to the boundaries where months and weeks overlap their next sibling
+BOUNDARY_MOMENTS = [
+    datetime(1990, 1, 1),
+    datetime(1990, 2, 28, 23),
+    datetime(1992, 2, 29, 12),
+    datetime(1992, 3, 1),
+    datetime(1995, 3, 28, 7),
+    datetime(1995, 3, 29, 8),
+    datetime(1999, 12, 31, 23),
+    datetime(2000, 1, 1),
+    datetime(2013, 4, 22, 15),
+    datetime(2013, 4, 30, 16),
+    datetime(2024, 1, 31, 23),
+    datetime(2024, 2, 29, 0),
+    datetime(2079, 12, 31, 23),
+]
+
+
+def window_at(birthdate, now):
+    window = ValidityWindow(birthdate, BIRTH_YEAR)
+    window.now = now
+    window.now_key = TimeNode.key_for(now, BIRTH_YEAR)
+    return window
+
+
+def keys_near(*bound_keys):
+    """Every sibling along the paths of bound_keys, and the children of each."""
+    keys = {""}
+    for bound_key in bound_keys:
+        for length in range(len(bound_key)):
+            for sibling in TimeNode(bound_key[:length]).get_child_letters():
+                key = bound_key[:length] + sibling
+                keys.add(key)
+                keys.update(key + letter for letter in TimeNode(key).get_child_letters())
+    return keys
+
+
+def is_valid_by_interval(window, key):
+    start, _ = TimeNode.interval(key, BIRTH_YEAR)
+    return window.birthdate <= start <= window.now
+
+
+def moment_pairs():
+    rng = random.Random(4)
+    moments = list(BOUNDARY_MOMENTS)
+    for _ in range(40):
+        moment = datetime(BIRTH_YEAR, 1, 1) + timedelta(hours=rng.randrange(90 * 365 * 24))
+        moments.append(moment)
+        # The hour before and after lands on the other side of the overlapping levels
+        moments.extend([moment - timedelta(hours=1), moment + timedelta(hours=1)])
+    pairs = []
+    for _ in range(60):
+        birthdate, now = sorted(rng.sample(moments, 2))
+        pairs.append((birthdate, now))
+    pairs.extend((moment, moment) for moment in BOUNDARY_MOMENTS)
+    return pairs
+
+
+@pytest.mark.parametrize("birthdate, now", moment_pairs())
+def test_matches_interval(birthdate, now):
+    window = window_at(birthdate, now)
+    for key in keys_near(window.birth_key, window.now_key):
+        expected = is_valid_by_interval(window, key)
+        assert window.is_valid(key) == expected, key
+        if key and window.is_outside(key):
+            assert not expected, key
+
+
+@pytest.mark.parametrize("birthdate, now", moment_pairs()[:20])
+def test_has_valid_child(birthdate, now):
+    window = window_at(birthdate, now)
+    for key in keys_near(window.birth_key, window.now_key):
+        if len(key) < len(TimeNode.LEVELS):
+            expected = any(
+                is_valid_by_interval(window, key + letter) for letter in TimeNode(key).get_child_letters()
+            )
+            assert window.has_valid_child(key) == expected, key
@@ -0,0 +1,154 @@
+"""Vectorized TimeNode codec over NumPy arrays.
+
+Encodes arrays of moments into keys and decodes arrays of keys into their
+[start, end) intervals in one pass each, with exactly the semantics of
+TimeNode.key_for and TimeNode.interval. NumPy is optional for the app:
+import this module inside try/except ImportError.
+"""
+import numpy as np
+
+from timenode import TimeNode
+
+DEPTH = len(TimeNode.LEVELS)
+CHILD_COUNTS = np.array([count for _, count, _, _ in TimeNode.LEVELS])
+LAST_CHILDREN = CHILD_COUNTS - 1
+
+# Length of each key span by key length: whole months up to the month level, hours below
+SPAN_MONTHS = np.array([90 * 12, 10 * 12, 12, 3, 1, 0, 0, 0, 0])
+SPAN_HOURS = np.array([0, 0, 0, 0, 0, 7 * 24, 24, 8, 1])
+
+MONTH_NAMES = np.array(["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"])
+
+
+def as_moments(moments):
+    """datetime64[s] array from datetime64 values, datetimes or ISO strings."""
+    return np.asarray(moments, dtype="datetime64[s]")
+
+
+def digits_for(moments, birth_year):
+    """(n, 8) array of child indexes at every level, as TimeNode.key_for picks them,
+    and a mask of moments before birth_year that have no key at all."""
+    moments = as_moments(moments)
+    months = moments.astype("datetime64[M]")
+    days = moments.astype("datetime64[D]")
+
+    years = months.astype("datetime64[Y]").astype(np.int64) + 1970 - birth_year
+    month = months.astype(np.int64) % 12
+    day = (days - months.astype("datetime64[D]")).astype(np.int64)
+    hour = (moments.astype("datetime64[h]") - days.astype("datetime64[h]")).astype(np.int64)
+    week = np.minimum(day // 7, CHILD_COUNTS[4] - 1)
+
+    digits = np.stack(
+        [years // 10, years % 10, month // 3, month % 3, week, day - 7 * week, hour // 8, hour % 8],
+        axis=1,
+    )
+
+    # Past the last child at some level: take the last child from there down
+    overflow = digits >= CHILD_COUNTS
+    first = np.where(overflow.any(axis=1), overflow.argmax(axis=1), DEPTH)
+    digits = np.where(np.arange(DEPTH) >= first[:, None], LAST_CHILDREN, digits)
+    return digits, years < 0
+
+
+def keys_for(moments, birth_year, depth=DEPTH):
+    """Array of keys like TimeNode.key_for for every moment; "" before birth_year."""
+    digits, before = digits_for(moments, birth_year)
+    letters = np.ascontiguousarray(digits[:, :depth] + ord("A"), dtype=np.uint8)
+    keys = letters.view(f"S{depth}")[:, 0].astype(f"U{depth}") if depth else np.full(len(digits), "")
+    keys[before] = ""
+    return keys
+
+
+def key_digits(keys):
+    """(n, 8) child indexes of keys, zero past their end, and their lengths.
+
+    Raises ValueError on any key TimeNode.interval would reject.
+    """
+    raw = np.asarray(keys, dtype="U").reshape(-1)
+    width = raw.dtype.itemsize // 4
+    if width > DEPTH:
+        raise ValueError(f"Invalid TimeNode key {str(raw[np.char.str_len(raw) > DEPTH][0])!r}")
+    codes = np.zeros((raw.size, DEPTH), dtype=np.int64)
+    if width:
+        codes[:, :width] = raw.view(np.uint32).reshape(raw.size, width)
+    lengths = np.count_nonzero(codes, axis=1)
+
+    digits = np.where(np.arange(DEPTH) < lengths[:, None], codes - ord("A"), 0)
+    invalid = ((digits < 0) | (digits >= CHILD_COUNTS)).any(axis=1)
+    if invalid.any():
+        raise ValueError(f"Invalid TimeNode key {str(raw[invalid][0])!r}")
+    return digits, lengths
+
+
+def intervals(keys, birth_year):
+    """(starts, ends) datetime64[s] arrays of the [start, end) span of every key."""
+    digits, lengths = key_digits(keys)
+    decade, year, quarter, month, week, day, day_part, hour = digits.T
+
+    start_months = (
+        (birth_year - 1970 + 10 * decade + year) * 12 + 3 * quarter + month
+    ).astype("datetime64[M]")
+    starts = (
+        start_months.astype("datetime64[s]")
+        + ((7 * week + day) * 24 + 8 * day_part + hour).astype("timedelta64[h]")
+    )
+    month_ends = (start_months + SPAN_MONTHS[lengths]).astype("datetime64[s]")
+    hour_ends = starts + SPAN_HOURS[lengths].astype("timedelta64[h]")
+    ends = np.where(SPAN_MONTHS[lengths] > 0, month_ends, hour_ends)
+    return starts, ends
+
+
+def valid_mask(keys, birthdate, now, birth_year):
+    """Whether every key starts between birthdate and now, like ValidityWindow.is_valid."""
+    starts, _ = intervals(keys, birth_year)
+    return (starts >= as_moments(birthdate)) & (starts <= as_moments(now))
+
+
+def subtree(key, depth, birth_year):
+    """(keys, starts, ends) of every descendant of key down to depth levels below it."""
+    keys = np.array(TimeNode(key).descendant_keys(depth), dtype=f"U{DEPTH}")
+    starts, ends = intervals(keys, birth_year)
+    return keys, starts, ends
+
+
+def timeframe_labels(keys, birth_year):
+    """Array of timeframe_label(key, birth_year) for every key."""
+    keys = np.asarray(keys, dtype="U")
+    starts, ends = intervals(keys, birth_year)
+    _, lengths = key_digits(keys)
+
+    def parts(moments):
+        months = moments.astype("datetime64[M]")
+        days = moments.astype("datetime64[D]")
+        year = moments.astype("datetime64[Y]").astype(str)
+        month = MONTH_NAMES[months.astype(np.int64) % 12]
+        day = np.char.zfill(((days - months.astype("datetime64[D]")).astype(np.int64) + 1).astype(str), 2)
+        hour = np.char.zfill(
+            (moments.astype("datetime64[h]") - days.astype("datetime64[h]")).astype(np.int64).astype(str), 2
+        )
+        return year, month, day, hour
+
+    def join(*pieces):
+        label = pieces[0]
+        for piece in pieces[1:]:
+            label = np.char.add(label, piece)
+        return label
+
+    year, month, day, hour = parts(starts)
+    end_year, end_month, end_day, end_hour = parts(ends)
+    day_label = join(year, " ", month, " ", day)
+    by_length = [
+        np.full(keys.shape, "Lifetime"),
+        join(year, " - ", end_year),
+        year,
+        join(year, " : ", month, " - ", end_month),
+        join(year, " : ", month),
+        join(year, " ", month, " : ", day, " - ", end_day),
+        day_label,
+        join(day_label, " : ", hour, " - ", end_hour),
+        join(day_label, " : ", hour),
+    ]
+    labels = np.empty(keys.shape, dtype=object)
+    for length, label in enumerate(by_length):
+        labels[lengths == length] = label[lengths == length]
+    return labels.astype(str)
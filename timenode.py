@@ -0,0 +1,209 @@
+import time
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+KEY_LETTERS = "ABCDEFGHIJ"
+
+
+class TimeNode:
+    LEVELS = [
+        ("decade", 9, "years", 10),  # 0: A-I (0-8) representing 10-year spans
+        ("year", 10, "years", 1),  # 1: A-J (0-9) years in decade
+        ("quarter", 4, "months", 3),  # 2: A-D (0-3) quarters
+        ("month", 3, "months", 1),  # 3: A-C (0-2) months in quarter
+        ("week", 4, "days", 7),  # 4: A-D (0-3) ~week spans
+        ("day", 8, "days", 1),  # 5: A-H (0-7) days in week span
+        ("day_part", 3, "hours", 8),  # 6: A-C (0-2) 8-hour parts
+        ("hour", 8, "hours", 1),  # 7: A-H (0-7) hours in part
+    ]
+
+    def __init__(self, key=""):
+        self.key = key
+        self.level = len(key)
+
+    @property
+    def max_children(self):
+        return self.LEVELS[self.level][1] if self.level < 8 else 0
+
+    def get_child_letters(self):
+        if self.level >= 8:
+            return []
+        base = ord("A")
+        return [chr(base + i) for i in range(self.max_children)]
+
+    @staticmethod
+    @lru_cache(maxsize=16384)
+    def interval(key, birth_year):
+        """[start, end) datetimes covered by key, counted from 1 Jan of birth_year.
+
+        Every level only ever offsets the start by whole years, months, days or
+        hours, so the start is assembled directly from the key letters instead of
+        adding one relativedelta per level.
+        """
+        digits = [ord(char) - ord("A") for char in key]
+        for level, idx in enumerate(digits):
+            if level >= len(TimeNode.LEVELS) or not 0 <= idx < TimeNode.LEVELS[level][1]:
+                raise ValueError(f"Invalid TimeNode key {key!r}")
+        decade, year, quarter, month, week, day, day_part, hour = digits + [0] * (
+            len(TimeNode.LEVELS) - len(digits)
+        )
+
+        start = datetime(birth_year + 10 * decade + year, 1 + 3 * quarter + month, 1)
+        start += timedelta(days=7 * week + day, hours=8 * day_part + hour)
+
+        if not key:
+            _, count, unit, amount = TimeNode.LEVELS[0]
+            amount *= count
+        else:
+            _, _, unit, amount = TimeNode.LEVELS[len(key) - 1]
+
+        if unit == "years":
+            end = start.replace(year=start.year + amount)
+        elif unit == "months":
+            months = start.month - 1 + amount
+            end = start.replace(year=start.year + months // 12, month=months % 12 + 1)
+        else:
+            end = start + timedelta(**{unit: amount})
+        return start, end
+
+    @staticmethod
+    def key_for(moment, birth_year, depth=8):
+        """Key of the latest node at every level whose interval starts at or before moment."""
+        years = moment.year - birth_year
+        if years < 0:
+            return ""
+
+        day = moment.day - 1
+        week = min(day // 7, TimeNode.LEVELS[4][1] - 1)
+        digits = [
+            years // 10,
+            years % 10,
+            (moment.month - 1) // 3,
+            (moment.month - 1) % 3,
+            week,
+            day - 7 * week,
+            moment.hour // 8,
+            moment.hour % 8,
+        ]
+        # Only decades and days can run past their last child
+        if digits[0] >= 9 or digits[5] >= 8:
+            for level, idx in enumerate(digits):
+                if idx >= TimeNode.LEVELS[level][1]:
+                    # moment lies past the last child: take the last child from here down
+                    digits[level:] = [count - 1 for _, count, _, _ in TimeNode.LEVELS[level:]]
+                    break
+        return "".join(map(KEY_LETTERS.__getitem__, digits[:depth]))
+
+    def descendant_keys(self, depth):
+        """Keys of every descendant down to depth levels below this node."""
+        keys = []
+        level_keys = [self.key]
+        for _ in range(depth):
+            level_keys = [key + letter for key in level_keys for letter in TimeNode(key).get_child_letters()]
+            keys.extend(level_keys)
+        return keys
+
+    def ancestor_keys(self):
+        """Keys of this node and every node above it, up to the root."""
+        return [self.key[:length] for length in range(len(self.key), -1, -1)]
+
+    def descendant_range(self):
+        """(low, high) bounds so that low < key < high holds for every descendant key."""
+        if not self.key:
+            return self.key, None
+        return self.key, self.key[:-1] + chr(ord(self.key[-1]) + 1)
+
+
+class ValidityWindow:
+    """Decides whether keys start between the birthdate and now by comparing key prefixes.
+
+    birth_key and now_key hold the latest node at every level starting at or
+    before those moments. A key that branches off to a later sibling starts
+    after the moment, one that branches off to an earlier sibling ends before
+    it, so whole subtrees are settled without any date arithmetic. Months and
+    weeks reach a little into their next sibling (28 days in February, 8 days
+    in a week), so an adjacent earlier sibling at those levels and keys lying
+    on the boundary path fall back to the cached interval.
+    """
+
+    REFRESH_SECONDS = 60
+    OVERLAPPING_LEVELS = (3, 4)
+
+    def __init__(self, birthdate, birth_year):
+        self.birthdate = birthdate
+        self.birth_year = birth_year
+        self.birth_key = TimeNode.key_for(birthdate, birth_year)
+        self.expires_at = 0
+        self.refresh()
+
+    def refresh(self):
+        if time.monotonic() < self.expires_at:
+            return
+        self.now = datetime.now()
+        self.now_key = TimeNode.key_for(self.now, self.birth_year)
+        self.expires_at = time.monotonic() + self.REFRESH_SECONDS
+
+    def compare(self, key, bound_key):
+        """1 if the subtree of key starts after bound_key's moment, -1 if it starts
+        before it, 0 if key is on bound_key's path and None if undecided."""
+        for level in range(min(len(key), len(bound_key))):
+            if key[level] == bound_key[level]:
+                continue
+            if key[level] > bound_key[level]:
+                return 1
+            if level in self.OVERLAPPING_LEVELS and ord(key[level]) + 1 == ord(bound_key[level]):
+                return None
+            return -1
+        return 1 if len(key) > len(bound_key) else 0
+
+    def is_outside(self, key):
+        """Whole subtree of key starts after now or before the birthdate."""
+        return self.compare(key, self.now_key) == 1 or self.compare(key, self.birth_key) == -1
+
+    def is_valid(self, key):
+        after_now = self.compare(key, self.now_key)
+        after_birth = self.compare(key, self.birth_key)
+        if after_now == 1 or after_birth == -1:
+            return False
+        if after_now is not None and after_birth == 1:
+            return True
+
+        start, _ = TimeNode.interval(key, self.birth_year)
+        return self.birthdate <= start <= self.now
+
+    def has_valid_child(self, key):
+        if self.is_outside(key):
+            return False
+        return any(self.is_valid(key + letter) for letter in TimeNode(key).get_child_letters())
+
+
+def timeframe_label(key, birth_year):
+    """Human readable span of key, e.g. "1995 : Apr - Jul" for a quarter."""
+    if not key:
+        return "Lifetime"
+
+    try:
+        start_date, end_date = TimeNode.interval(key, birth_year)
+
+        # TODO lables are better - still could be cleaned up
+        if key and len(key) == 1:
+            return f"{start_date.strftime('%Y')} - {end_date.strftime('%Y')}"
+        elif key and len(key) == 2:
+            return f"{start_date.strftime('%Y')}"
+            # return f"{start_date.strftime('%Y')} - {end_date.strftime('%Y')}"
+        elif key and len(key) == 3:
+            return f"{start_date.strftime('%Y')} : {start_date.strftime('%b')} - {end_date.strftime('%b')}"
+        elif key and len(key) == 4:
+            return f"{start_date.strftime('%Y')} : {start_date.strftime('%b')}"
+        elif key and len(key) == 5:
+            return f"{start_date.strftime('%Y')} {start_date.strftime('%b')} : {start_date.strftime('%d')} - {end_date.strftime('%d')}"
+        elif key and len(key) == 6:
+            return f"{start_date.strftime('%Y')} {start_date.strftime('%b')} {start_date.strftime('%d')}"
+        elif key and len(key) == 7:
+            return f"{start_date.strftime('%Y')} {start_date.strftime('%b')} {start_date.strftime('%d')} : {start_date.strftime('%H')} - {end_date.strftime('%H')}"
+        elif key and len(key) == 8:
+            return f"{start_date.strftime('%Y')} {start_date.strftime('%b')} {start_date.strftime('%d')} : {start_date.strftime('%H')}"
+        else:
+            return f"{start_date.strftime('%Y-%m-%d %H')} - {end_date.strftime('%Y-%m-%d %H')}"
+    except Exception as e:
+        return f"Timeframe Error: {str(e)}"
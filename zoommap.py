@@ -0,0 +1,326 @@
+import math
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from PyQt5.QtCore import QRectF, Qt
+from PyQt5.QtGui import QColor, QPainter, QPalette, QPixmap
+from PyQt5.QtWidgets import QGraphicsScene, QGraphicsView
+
+from instrumentation import profiler
+from memory_store import NodeStats
+from timenode import TimeNode, timeframe_label
+
+# Horizontal scale of tier 0, in pixels per hour: about 900 px for 90 years
+BASE_PX_PER_HOUR = 1 / 1024
+MAX_TIER = 20
+TILE_WIDTH = 256
+TILE_CACHE = 128
+
+MAP_HEIGHT = 480
+HEADER_HEIGHT = 22
+# Levels are drawn while their nodes are at least this wide at the tile tier
+MIN_NODE_PX = 56
+# Wide nodes repeat their label this often, at the same spots in every tile
+LABEL_REPEAT = 2 * TILE_WIDTH
+CLICK_SLOP = 4
+
+HOURS_PER_UNIT = {"years": 8766, "months": 730.5, "days": 24, "hours": 1}
+# Typical span of a node at each depth, in hours
+NODE_HOURS = [HOURS_PER_UNIT[unit] * amount for _, _, unit, amount in TimeNode.LEVELS]
+
+
+def heat_alpha(count, max_count):
+    """Opacity of the shade of a cell with count records, on a log scale up to max_count."""
+    if not count:
+        return 0
+    return int(40 + 180 * min(1.0, math.log1p(count) / math.log1p(max_count)))
+
+
+def tier_px_per_hour(tier):
+    return BASE_PX_PER_HOUR * 2 ** tier
+
+
+def lod_depth(tier):
+    """Deepest level whose nodes are still MIN_NODE_PX wide at tier."""
+    px_per_hour = tier_px_per_hour(tier)
+    depth = 1
+    while depth < len(NODE_HOURS) and NODE_HOURS[depth] * px_per_hour >= MIN_NODE_PX:
+        depth += 1
+    return depth
+
+
+class ZoomMap(QGraphicsView):
+    """The whole lifetime on one timeline, zoomed and panned continuously.
+
+    Scene x is in hours since 1 Jan of the birth year. The view draws the
+    background from tiles rendered at discrete tiers of zoom, each tier twice
+    the scale of the previous one. A tile shows every level down to the
+    level of detail of its tier: one thin header band per level above and a
+    tall band with selected titles for the deepest one. Tiles are kept as
+    QPixmaps in an LRU cache, so panning over tiles already seen never
+    touches SQLite; writes drop the tiles of the timeframes they touched.
+    """
+
+    def __init__(self, store, validity, on_open):
+        super().__init__()
+        self.store = store
+        self.birth_year = validity.birth_year
+        self.on_open = on_open
+        # Shared with the app, so both agree on "now"
+        self.validity = validity
+        self.tiles_now_key = validity.now_key
+        self.origin = datetime(self.birth_year, 1, 1)
+        self.lifetime_hours = self.hours(TimeNode.interval("", self.birth_year)[1])
+        self.tiles = OrderedDict()
+        self.heat_scale = self.compute_heat_scale()
+        self.selected_key = None
+        self.press_pos = None
+        self.fitted = False
+
+        self.setScene(QGraphicsScene(0, 0, self.lifetime_hours, MAP_HEIGHT, self))
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.setAlignment(Qt.AlignLeft | Qt.AlignTop)
+        self.setMinimumHeight(MAP_HEIGHT // 2)
+
+    def hours(self, moment):
+        return (moment - self.origin).total_seconds() / 3600
+
+    def span(self, key):
+        """[start, end) of key in scene hours, within its parent.
+
+        The last child reaches the end of its parent, as TimeNode.key_for files
+        the days past the last week or day under it.
+        """
+        start, end = TimeNode.interval(key, self.birth_year)
+        if key:
+            parent = TimeNode(key[:-1])
+            parent_end = TimeNode.interval(parent.key, self.birth_year)[1]
+            end = parent_end if key[-1] == parent.get_child_letters()[-1] else min(end, parent_end)
+        return self.hours(start), self.hours(end)
+
+    # Scale
+
+    def px_per_hour(self):
+        return self.transform().m11()
+
+    def min_px_per_hour(self):
+        return self.viewport().width() / self.lifetime_hours
+
+    def tier(self):
+        """Tier rendered at no less than the current scale, so tiles only ever shrink."""
+        ratio = self.px_per_hour() / BASE_PX_PER_HOUR
+        return min(MAX_TIER, max(0, math.ceil(math.log2(ratio) - 1e-9)))
+
+    def set_px_per_hour(self, px_per_hour):
+        px_per_hour = min(max(px_per_hour, self.min_px_per_hour()), tier_px_per_hour(MAX_TIER))
+        self.scale(px_per_hour / self.px_per_hour(), 1)
+
+    def show_key(self, key):
+        """Zoom and pan so key fills most of the view."""
+        start, end = self.span(key)
+        self.set_px_per_hour(0.9 * self.viewport().width() / (end - start))
+        self.centerOn((start + end) / 2, MAP_HEIGHT / 2)
+
+    def set_selected(self, key):
+        if key != self.selected_key:
+            self.selected_key = key
+            self.viewport().update()
+
+    # Tiles
+
+    def compute_heat_scale(self):
+        """Record count shaded fully at each depth: a few times the count of an average node so far.
+
+        Rounded to powers of two, so it rarely moves and the tiles stay consistent.
+        """
+        total = self.store.fetch_node_stats([""]).get("", NodeStats()).record_count
+        lived_hours = max(1.0, self.hours(datetime.now()) - self.hours(self.validity.birthdate))
+        return [2 ** max(1, math.ceil(math.log2(4 * total * node_hours / lived_hours + 1))) for node_hours in NODE_HOURS]
+
+    def invalidate(self, node_keys=None):
+        """Drop the tiles showing any of node_keys, or all of them.
+
+        The heat scale only moves when all tiles go, so tiles rendered at
+        different times always shade alike.
+        """
+        if node_keys is None:
+            self.heat_scale = self.compute_heat_scale()
+            self.tiles.clear()
+        else:
+            spans = [self.span(key) for key in node_keys if key]
+            for tier, index in list(self.tiles):
+                tile_hours = TILE_WIDTH / tier_px_per_hour(tier)
+                left, right = index * tile_hours, (index + 1) * tile_hours
+                if any(start < right and left < end for start, end in spans):
+                    del self.tiles[tier, index]
+        self.viewport().update()
+
+    def tile(self, tier, index):
+        entry = (tier, index)
+        if entry in self.tiles:
+            self.tiles.move_to_end(entry)
+            return self.tiles[entry]
+        profiler.begin("tile")
+        try:
+            pixmap = self.render_tile(tier, index)
+        finally:
+            profiler.end()
+        self.tiles[entry] = pixmap
+        while len(self.tiles) > TILE_CACHE:
+            self.tiles.popitem(last=False)
+        return pixmap
+
+    def keys_in(self, left, right, depth):
+        """Keys at every level down to depth whose spans overlap [left, right), by level."""
+        levels = [[] for _ in range(depth)]
+        parents = [""]
+        for level in range(depth):
+            for parent in parents:
+                for letter in TimeNode(parent).get_child_letters():
+                    key = parent + letter
+                    start, end = self.span(key)
+                    if start < right and left < end:
+                        levels[level].append(key)
+            parents = levels[level]
+        return levels
+
+    def band(self, level, depth):
+        """(top, height) of the band showing level, with depth levels on the tile."""
+        if level < depth - 1:
+            return level * HEADER_HEIGHT, HEADER_HEIGHT
+        top = (depth - 1) * HEADER_HEIGHT
+        return top, MAP_HEIGHT - top
+
+    def render_tile(self, tier, index):
+        px_per_hour = tier_px_per_hour(tier)
+        left = index * TILE_WIDTH / px_per_hour
+        right = (index + 1) * TILE_WIDTH / px_per_hour
+        depth = lod_depth(tier)
+        levels = self.keys_in(left, right, depth)
+
+        with profiler.phase("tile fetch"):
+            keys = [key for level_keys in levels for key in level_keys]
+            node_stats = self.store.fetch_node_stats(keys)
+            selected_titles = self.store.fetch_titles_selected_for(levels[-1])
+            best_titles = self.store.fetch_best_titles(levels[-1])
+
+        with profiler.phase("tile paint"):
+            palette = self.palette()
+            pixmap = QPixmap(TILE_WIDTH, MAP_HEIGHT)
+            pixmap.fill(palette.color(QPalette.Window))
+            painter = QPainter(pixmap)
+            metrics = painter.fontMetrics()
+            heat_color = QColor(255, 140, 0)
+            for level, level_keys in enumerate(levels):
+                top, height = self.band(level, depth)
+                for key in level_keys:
+                    start, end = self.span(key)
+                    x = (start - left) * px_per_hour
+                    rect = QRectF(x, top, (end - start) * px_per_hour, height).adjusted(0, 1, -1, -1)
+                    group = QPalette.Active if self.validity.is_valid(key) else QPalette.Disabled
+
+                    count = node_stats.get(key, NodeStats()).record_count
+                    painter.setPen(palette.color(group, QPalette.Mid))
+                    painter.setBrush(palette.color(group, QPalette.Button))
+                    painter.drawRect(rect)
+                    if count:
+                        heat_color.setAlpha(heat_alpha(count, self.heat_scale[level]))
+                        painter.fillRect(rect.adjusted(1, 1, 0, 0), heat_color)
+
+                    text = timeframe_label(key, self.birth_year)
+                    if count:
+                        text += f"  ({count})"
+                    if level == depth - 1 and selected_titles.get(key):
+                        text += "\n" + "\n".join(selected_titles[key])
+                    elif level == depth - 1 and key in best_titles:
+                        text += "\n" + best_titles[key]
+
+                    painter.setPen(palette.color(group, QPalette.ButtonText))
+                    # Labels sit at fixed spots along the node, so they line up across tiles
+                    label_x = x
+                    while label_x < min(rect.right(), TILE_WIDTH):
+                        width = min(LABEL_REPEAT, rect.right() - label_x) - 8
+                        if label_x + width > 0 and width > metrics.averageCharWidth() * 3:
+                            lines = [metrics.elidedText(line, Qt.ElideRight, int(width)) for line in text.split("\n")]
+                            painter.drawText(
+                                QRectF(label_x + 4, top + 3, width, height - 4),
+                                Qt.AlignLeft | Qt.AlignTop,
+                                "\n".join(lines),
+                            )
+                        label_x += LABEL_REPEAT
+            painter.end()
+        return pixmap
+
+    # Painting and input
+
+    def refresh_validity(self):
+        """Move "now" along; tiles rendered before it reached a new hour shade too few nodes."""
+        self.validity.refresh()
+        if self.validity.now_key != self.tiles_now_key:
+            self.tiles_now_key = self.validity.now_key
+            self.tiles.clear()
+
+    def drawBackground(self, painter, rect):
+        self.refresh_validity()
+        tier = self.tier()
+        tile_hours = TILE_WIDTH / tier_px_per_hour(tier)
+        first = max(0, int(rect.left() // tile_hours))
+        last = min(int(rect.right() // tile_hours), int(self.lifetime_hours // tile_hours))
+        painter.save()
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        for index in range(first, last + 1):
+            pixmap = self.tile(tier, index)
+            painter.drawPixmap(
+                QRectF(index * tile_hours, 0, tile_hours, MAP_HEIGHT), pixmap, QRectF(pixmap.rect())
+            )
+        painter.restore()
+
+    def drawForeground(self, painter, rect):
+        if not self.selected_key:
+            return
+        depth = lod_depth(self.tier())
+        level = min(len(self.selected_key), depth) - 1
+        start, end = self.span(self.selected_key[: level + 1])
+        top, height = self.band(level, depth)
+        pen = painter.pen()
+        pen.setColor(self.palette().color(QPalette.Highlight))
+        pen.setWidth(3)
+        pen.setCosmetic(True)
+        painter.setPen(pen)
+        painter.setBrush(Qt.NoBrush)
+        painter.drawRect(QRectF(start, top, end - start, height))
+
+    def key_at(self, pos):
+        point = self.mapToScene(pos)
+        if not 0 <= point.x() < self.lifetime_hours or not 0 <= point.y() < MAP_HEIGHT:
+            return None
+        depth = lod_depth(self.tier())
+        level = min(int(point.y() // HEADER_HEIGHT), depth - 1)
+        moment = self.origin + timedelta(hours=point.x())
+        return TimeNode.key_for(moment, self.birth_year, level + 1)
+
+    def wheelEvent(self, event):
+        self.set_px_per_hour(self.px_per_hour() * 1.0015 ** event.angleDelta().y())
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        if not self.fitted or self.px_per_hour() < self.min_px_per_hour():
+            self.fitted = True
+            self.set_px_per_hour(self.min_px_per_hour())
+
+    def mousePressEvent(self, event):
+        self.press_pos = event.pos()
+        super().mousePressEvent(event)
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        if self.press_pos is None or event.button() != Qt.LeftButton:
+            return
+        moved = (event.pos() - self.press_pos).manhattanLength()
+        self.press_pos = None
+        key = self.key_at(event.pos()) if moved <= CLICK_SLOP else None
+        self.refresh_validity()
+        if key and self.validity.is_valid(key):
+            self.on_open(key)